@@ -0,0 +1,65 @@
+"""Benchmark the import time of the basewebapi package for different users.
+
+Each import is run in a fresh interpreter, so nothing is cached between
+runs.  Run from the repository root with:
+
+    python benchmarks/import_time.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+CASES = {
+    "baseline (python only)": "pass",
+    "JSON classes": "from basewebapi import JSONBaseObject, JSONBaseList",
+    "BaseWebAPI": "from basewebapi import BaseWebAPI",
+    "AsyncBaseWebAPI": "from basewebapi.asyncbasewebapi import AsyncBaseWebAPI",
+}
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = [m for m in ("requests", "aiohttp") if m in sys.modules]
+print(elapsed, ",".join(heavy) or "-")
+"""
+
+
+def time_import(statement: str, runs: int) -> tuple:
+    """Time an import statement in fresh interpreters
+
+    :param statement: The import statement to run
+    :param runs: The number of interpreters to start
+    :return: The median time in milliseconds and heavy modules imported
+    """
+    times = []
+    heavy = ""
+    env = dict(os.environ, PYTHONPATH=SRC)
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(statement=statement)],
+            capture_output=True,
+            check=True,
+            env=env,
+            text=True,
+        ).stdout.split()
+        times.append(float(output[0]) * 1000)
+        heavy = output[1]
+    return statistics.median(times), heavy
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print(f"{'import':<25}{'median ms':>12}  heavy modules loaded")
+    for name, statement in CASES.items():
+        median, heavy = time_import(statement, runs)
+        print(f"{name:<25}{median:>12.1f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
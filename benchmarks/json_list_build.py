@@ -0,0 +1,59 @@
+"""Benchmark building a JSONBaseList from a 10^6 element JSON array, comparing
+the old append-then-copy construction with from_json and the process pool
+from_json_parallel.
+
+Run from the repository root with:
+
+    PYTHONPATH=src python benchmarks/json_list_build.py [items]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from basewebapi import JSONBaseList, JSONBaseObject
+
+
+class Pokemon(JSONBaseObject):
+    """An item class with child objects, as API wrappers typically have"""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(child_objects={"abilities": JSONBaseList}, **kwargs)
+
+
+def append_and_copy(data: list, item_class: type) -> JSONBaseList:
+    """The construction used before from_json was changed"""
+    temp_list = []
+    for item in data:
+        temp_list.append(item_class.from_json(item))
+    return JSONBaseList(temp_list)
+
+
+def measure(name: str, func, make_data, item_class: type) -> None:
+    """Time a construction, then run it again to trace its peak memory"""
+    start = time.perf_counter()
+    func(make_data(), item_class)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(make_data(), item_class)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<22}{elapsed:>8.2f} s{peak / 2**20:>10.0f} MiB peak")
+
+
+def main() -> None:
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    data = [
+        {"id": i, "name": f"pokemon-{i}", "abilities": [{"name": "static"}]}
+        for i in range(items)
+    ]
+    measure("append and copy", append_and_copy, lambda: data, Pokemon)
+    measure("from_json", JSONBaseList.from_json, lambda: data, Pokemon)
+    measure("from_json generator", JSONBaseList.from_json, lambda: iter(data), Pokemon)
+    measure(
+        "from_json_parallel", JSONBaseList.from_json_parallel, lambda: data, Pokemon
+    )
+
+
+if __name__ == "__main__":
+    main()
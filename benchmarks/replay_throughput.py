@@ -0,0 +1,66 @@
+"""Benchmark the transaction overhead of BaseWebAPI and AsyncBaseWebAPI by
+replaying a synthetic cassette, so no network is involved.
+
+Run from the repository root with:
+
+    PYTHONPATH=src python benchmarks/replay_throughput.py [transactions]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from basewebapi import BaseWebAPI
+from basewebapi.asyncbasewebapi import AsyncBaseWebAPI
+from basewebapi.cassette import Cassette
+
+BODY = json.dumps({"name": "pikachu", "id": 25, "abilities": []}).encode()
+HEADERS = {"Content-Type": "application/json"}
+
+
+def make_cassette(path: str, paths: int) -> None:
+    """Write a cassette with one recorded response for each path"""
+    with Cassette(path, "record") as cassette:
+        for i in range(paths):
+            url = f"http://localhost/api/v2/pokemon/{i}/"
+            cassette.record("get", url, None, 200, HEADERS, BODY, 0.05)
+
+
+def bench_sync(path: str, transactions: int, paths: int) -> float:
+    api = BaseWebAPI("localhost", "", "")
+    api.cassette = Cassette(path)
+    start = time.perf_counter()
+    for i in range(transactions):
+        api._transaction("get", f"/api/v2/pokemon/{i % paths}/").json()
+    return transactions / (time.perf_counter() - start)
+
+
+async def bench_async(path: str, transactions: int, paths: int) -> float:
+    async with AsyncBaseWebAPI("localhost", "", "") as api:
+        api.cassette = Cassette(path)
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[
+                api._transaction("get", f"/api/v2/pokemon/{i % paths}/")
+                for i in range(transactions)
+            ]
+        )
+        return transactions / (time.perf_counter() - start)
+
+
+def main() -> None:
+    transactions = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    paths = 1000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "cassette.gz")
+        make_cassette(path, paths)
+        print(f"BaseWebAPI       {bench_sync(path, transactions, paths):>10.0f} req/s")
+        rate = asyncio.run(bench_async(path, transactions, paths))
+        print(f"AsyncBaseWebAPI  {rate:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Microbenchmark building request URLs with f-strings against compiled
+routes, including the yarl.URL that aiohttp sends.
+
+Run from the repository root with:
+
+    PYTHONPATH=src python benchmarks/route_build.py [iterations]
+"""
+
+import itertools
+import sys
+import timeit
+from urllib.parse import quote
+
+from yarl import URL
+
+from basewebapi.asyncbasewebapi import AsyncBaseWebAPI
+from basewebapi.routes import EncodedURL, route
+
+NAMES = [f"pokemon-{i}" for i in range(1000)]
+
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    api = AsyncBaseWebAPI("pokeapi.co", "", "", secure=True)
+    pokemon = route("/api/v2/pokemon/{name}/forms/{form_id}/")
+    # Unique IDs defeat yarl's parse cache, as they would in production
+    ids = itertools.count()
+
+    def fstring_path():
+        i = next(ids)
+        return f"/api/v2/pokemon/{quote(NAMES[i % 1000], safe='')}/forms/{i}/"
+
+    def route_path():
+        i = next(ids)
+        return pokemon.build(name=NAMES[i % 1000], form_id=i)
+
+    def fstring_url():
+        return URL(api.base_url + fstring_path())
+
+    def route_url():
+        return api._encoded_url(EncodedURL(api.base_url + route_path()))
+
+    for name, func in (
+        ("f-string path", fstring_path),
+        ("route path", route_path),
+        ("f-string + yarl.URL", fstring_url),
+        ("route + parsed base", route_url),
+    ):
+        seconds = timeit.timeit(func, number=iterations)
+        print(f"{name:<22}{seconds / iterations * 1e9:>10.0f} ns/op")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark passing a decoded JSONBaseList between processes, comparing
+pickle with to_bytes/from_bytes, packed with msgpack if it is installed and
+with JSON, and reading single items with LazyJSONList.
+
+Run from the repository root with:
+
+    PYTHONPATH=src python benchmarks/serialise.py [items]
+"""
+
+import pickle
+import sys
+import time
+from unittest import mock
+
+from basewebapi import JSONBaseList, JSONBaseObject, serialise
+from basewebapi.serialise import LazyJSONList
+
+
+class Abilities(JSONBaseList):
+    """A child list of objects"""
+
+    @classmethod
+    def from_json(cls, data: list) -> "Abilities":
+        return super().from_json(data, JSONBaseObject)
+
+
+class Pokemon(JSONBaseObject):
+    """An item class with child objects, as API wrappers typically have"""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(child_objects={"abilities": Abilities}, **kwargs)
+
+
+def timed(func, *args):
+    """Run a function three times and return its result and the fewest
+    seconds it took"""
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def without_msgpack(func):
+    """Run a function with the JSON fallback rather than msgpack"""
+
+    def wrapper(*args):
+        with mock.patch.object(serialise, "msgpack", None):
+            return func(*args)
+
+    return wrapper
+
+
+def main() -> None:
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10**5
+    data = JSONBaseList.from_json(
+        (
+            {
+                "id": i,
+                "name": f"pokemon-{i}",
+                "abilities": [{"name": "static", "slot": 1}],
+                "height": 4,
+                "weight": 60,
+            }
+            for i in range(items)
+        ),
+        Pokemon,
+    )
+    formats = [
+        ("pickle", lambda x: pickle.dumps(x, pickle.HIGHEST_PROTOCOL), pickle.loads),
+        (
+            "to_bytes JSON",
+            without_msgpack(JSONBaseList.to_bytes),
+            without_msgpack(JSONBaseList.from_bytes),
+        ),
+        (
+            "to_bytes compressed",
+            lambda x: x.to_bytes(compress=True),
+            JSONBaseList.from_bytes,
+        ),
+    ]
+    if serialise.msgpack is not None:
+        formats.insert(
+            1, ("to_bytes msgpack", JSONBaseList.to_bytes, JSONBaseList.from_bytes)
+        )
+    print(f"{'':<22}{'dump':>8}{'load':>8}{'size':>12}")
+    for name, dump, load in formats:
+        encoded, dump_time = timed(dump, data)
+        _, load_time = timed(load, encoded)
+        print(f"{name:<22}{dump_time:>7.2f}s{load_time:>7.2f}s{len(encoded):>11,}B")
+    encoded = data.to_bytes()
+    _, lazy_time = timed(lambda: LazyJSONList(encoded)[items // 2])
+    print(f"{'LazyJSONList 1 item':<22}{'':>8}{lazy_time:>7.4f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,23 @@
-"""basewebapi module imports the main classes to this namespace
+"""basewebapi module imports the main classes to this namespace.  BaseWebAPI
+is imported on first use, so the JSON classes can be used without paying to
+import requests
 
 """
 
-from .basewebapi import BaseWebAPI
 from .json_objects import JSONBaseObject, JSONBaseList
+
+__all__ = ["BaseWebAPI", "JSONBaseObject", "JSONBaseList"]
+
+
+def __getattr__(name: str) -> type:
+    """Import the BaseWebAPI class the first time it is used"""
+    if name == "BaseWebAPI":
+        from .basewebapi import BaseWebAPI
+
+        globals()[name] = BaseWebAPI
+        return BaseWebAPI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
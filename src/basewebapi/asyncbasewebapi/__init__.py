@@ -1,5 +1,40 @@
-"""asyncbasewebapi module imports the main classes to this namespace
+"""asyncbasewebapi module imports the main classes to this namespace.
+AsyncBaseWebAPI is imported on first use, so the helper modules can be used
+without paying to import aiohttp
 
 """
 
-from .abasewebapi import AsyncBaseWebAPI
+from .hedging import HedgePolicy
+from .limiter import AdaptiveLimiter
+from .scheduler import (
+    PRIORITY_BULK,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PriorityScheduler,
+    SchedulerFullError,
+)
+
+__all__ = [
+    "AsyncBaseWebAPI",
+    "AdaptiveLimiter",
+    "HedgePolicy",
+    "PriorityScheduler",
+    "SchedulerFullError",
+    "PRIORITY_HIGH",
+    "PRIORITY_NORMAL",
+    "PRIORITY_BULK",
+]
+
+
+def __getattr__(name: str) -> type:
+    """Import the AsyncBaseWebAPI class the first time it is used"""
+    if name == "AsyncBaseWebAPI":
+        from .abasewebapi import AsyncBaseWebAPI
+
+        globals()[name] = AsyncBaseWebAPI
+        return AsyncBaseWebAPI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(__all__))
@@ -1,9 +1,58 @@
 """Module containing the synchronous BaseWebAPI class
 """
 
-from typing import Optional, Type, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Hashable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Type,
+    Union,
+)
 from types import TracebackType
+import asyncio
+import codecs
+import functools
+import json
+import time
 import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+from ..auth import AsyncAuthProvider
+from ..cassette import Cassette
+from ..deadline import Deadline
+from ..delta import Delta, DeltaSync
+from ..response_store import ResponseStore, StoredResponse
+from ..routes import EncodedURL, Route, route as compile_route
+from .hedging import HedgePolicy
+from .limiter import AdaptiveLimiter
+from .scheduler import PRIORITY_NORMAL, PriorityScheduler
+from ..streaming import (
+    DEFAULT_CHUNK_SIZE,
+    BodyBuffer,
+    ProgressCallback,
+    SpilledBody,
+    UploadSource,
+    astream_body,
+)
+
+
+class RawResponse(NamedTuple):
+    """An undecoded response, returned by AsyncBaseWebAPI._transaction
+    with raw=True
+
+    :cvar status: The HTTP status code of the response
+    :cvar headers: The headers of the response
+    :cvar body: The raw response body, or a SpilledBody if it was larger
+        than the spill_threshold
+    """
+
+    status: int
+    headers: CIMultiDictProxy
+    body: Union[bytes, SpilledBody]
 
 
 class AsyncBaseWebAPI:
@@ -31,6 +80,35 @@ class AsyncBaseWebAPI:
     :cvar headers: Constructed headers to include with all transactions
     :cvar status_codes: List of acceptable status codes from the API service
     :cvar basic_auth: If HTTP Basic auth should be used
+    :cvar timeout: The default number of seconds each transaction may take,
+        covering connect, send and read, or None for no limit
+    :cvar auth_provider: An AsyncAuthProvider object to add token headers to
+        all transactions, or None
+    :cvar response_store: A ResponseStore object used by _stored_transaction,
+        or None
+    :cvar cassette: A Cassette object to record transactions to or replay
+        transactions from, or None
+    :cvar limiter: An AdaptiveLimiter object to control how many
+        transactions are in flight at once, or None
+    :cvar scheduler: A PriorityScheduler object to order transactions by
+        priority and tenant, or None
+    :cvar max_body_size: The largest response body allowed in bytes, or None
+        for no limit
+    :cvar max_error_body: The number of bytes of an error response body to
+        keep in the exception message, or None to keep all of it
+    :cvar spill_threshold: The size in bytes above which response bodies are
+        written to a temporary file and returned as a SpilledBody, or None to
+        keep them in memory
+    :cvar hedge_policy: A HedgePolicy object to send a second request for
+        slow GET and HEAD transactions, or None
+    :cvar warmup_connections: The number of pooled connections to open when
+        the session is opened, so the first transactions don't wait for DNS,
+        TCP and TLS set up
+    :cvar warmup_path: The path requested with HEAD to open connections
+    :cvar keepalive_interval: The number of seconds between HEAD requests that
+        keep the pooled connections open, or None for no keep-alive probes.
+        aiohttp closes connections idle for 15 seconds, so this should be
+        less than that
     """
 
     def __init__(
@@ -57,6 +135,22 @@ class AsyncBaseWebAPI:
             self.base_url = f"{self.base_url}:{alt_port}"
         self.headers = {}
         self.status_codes = [200]
+        self.timeout = None
+        self.auth_provider: Optional[AsyncAuthProvider] = None
+        self.response_store: Optional[ResponseStore] = None
+        self._revalidating = {}
+        self._parsed_base_url = None
+        self.cassette: Optional[Cassette] = None
+        self.limiter: Optional[AdaptiveLimiter] = None
+        self.scheduler: Optional[PriorityScheduler] = None
+        self.hedge_policy: Optional[HedgePolicy] = None
+        self.max_body_size: Optional[int] = None
+        self.max_error_body: Optional[int] = 64 * 1024
+        self.spill_threshold: Optional[int] = None
+        self.warmup_connections = 0
+        self.warmup_path = "/"
+        self.keepalive_interval: Optional[float] = None
+        self._keepalive_task = None
         self._session = None
 
     def __enter__(self) -> None:
@@ -88,16 +182,27 @@ class AsyncBaseWebAPI:
         await self.close()
 
     async def open(self) -> None:
-        """Open an aiohttp.ClientSession that's stored in the object"""
+        """Open an aiohttp.ClientSession that's stored in the object, then
+        warm up its connections if warmup_connections or keepalive_interval
+        are set"""
         if not self._session:
             if self.basic_auth:
                 auth = aiohttp.BasicAuth(self.api_user, self.api_pass)
             else:
                 auth = None
             self._session = aiohttp.ClientSession(auth=auth)
+            if self.warmup_connections:
+                await self.warm_up()
+            if self.keepalive_interval:
+                self._keepalive_task = asyncio.ensure_future(self._keep_alive())
 
     async def close(self) -> None:
         """Close the aiohttp.ClientSession stored in the object"""
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            self._keepalive_task = None
+        for task in list(self._revalidating.values()):
+            task.cancel()
         if self._session:
             try:
                 await self._session.close()
@@ -106,6 +211,48 @@ class AsyncBaseWebAPI:
             finally:
                 self._session = None
 
+    async def warm_up(self, connections: Optional[int] = None) -> int:
+        """Resolve the host and open pooled keep-alive connections by sending
+        concurrent HEAD requests for the warmup_path.  Failed requests are
+        ignored, as the transactions will report any real problem.
+
+        :param connections: (optional): The number of connections to open,
+            defaults to warmup_connections or 1
+        :return: The number of requests that got a response
+        """
+        if self.cassette is not None and not self.cassette.recording:
+            return 0
+        if connections is None:
+            connections = max(self.warmup_connections, 1)
+        # The requests are sent at the same time so each needs a connection
+        results = await asyncio.gather(*[self._probe() for _ in range(connections)])
+        return sum(results)
+
+    async def _probe(self) -> bool:
+        """Send a HEAD request for the warmup_path, leaving the connection
+        in the pool
+
+        :return: If the request got a response
+        """
+        kwargs = {"ssl": None if self.enforce_cert else False}
+        if self.timeout:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=self.timeout)
+        try:
+            async with self._session.head(
+                self.base_url + self.warmup_path, allow_redirects=False, **kwargs
+            ) as conn:
+                await conn.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            return False
+        return True
+
+    async def _keep_alive(self) -> None:
+        """Probe the connections every keepalive_interval seconds until the
+        session is closed"""
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            await self.warm_up()
+
     @staticmethod
     def _input_error_check(**kwargs) -> None:
         """Check the supplied values are the correct data types"""
@@ -117,8 +264,16 @@ class AsyncBaseWebAPI:
                 raise ValueError(f"{var} must be a boolean")
 
     async def _transaction(
-        self, method: str, path: str, **kwargs
-    ) -> Union[str, dict, list]:
+        self,
+        method: str,
+        path: str,
+        deadline: Union[Deadline, float, None] = None,
+        priority: int = PRIORITY_NORMAL,
+        tenant: Hashable = None,
+        max_body_size: Optional[int] = None,
+        raw: bool = False,
+        **kwargs,
+    ) -> Union[str, dict, list, SpilledBody, RawResponse]:
         """This method is purely to make the HTTP call and verify that the
         HTTP status code is in the accepted list defined in __init__
         be checked by the calling method as this will vary depending on the API.
@@ -129,25 +284,575 @@ class AsyncBaseWebAPI:
         :param path: The path to the API object you wish to call.  This is the
             path only starting with the first forward slash , as this function
             will add the protocol, hostname and port number appropriately
+        :param deadline: (optional): A Deadline shared with other
+            transactions, or the number of seconds this transaction may take.
+            Defaults to the timeout property
+        :param priority: (optional): The priority class used by the
+            scheduler, lower numbers start first
+        :param tenant: (optional): The caller or tenant used by the scheduler
+            to share capacity fairly
+        :param max_body_size: (optional): The largest response body allowed
+            in bytes, defaults to the max_body_size property
+        :param raw: (optional): Return the status, headers and undecoded body
+            as a RawResponse
         :param kwargs: The collection of keyword arguments that the aiohttp
             request method will accept as documented at
-            https://docs.aiohttp.org/en/stable/client_reference.html
-        :return: Either the response string or decoded JSON object
+            https://docs.aiohttp.org/en/stable/client_reference.html.
+            Any headers given are merged with the headers property
+        :return: Either the response string or decoded JSON object, or a
+            SpilledBody if the body was larger than the spill_threshold, or a
+            RawResponse if raw is set
         :raises: (aiohttp.ClientResponseError, asyncio.exceptions.TimeoutError,
-            aiohttp.ClientConnectorError, TypeError)
+            aiohttp.ClientConnectorError, TypeError, ResponseTooLargeError)
         """
 
+        deadline = Deadline.resolve(deadline, self.timeout)
         kwargs["ssl"] = None if self.enforce_cert else False
-        kwargs["headers"] = self.headers
-        url = self.base_url + path
-        async with self._session.request(method, url, **kwargs) as conn:
+        kwargs["priority"] = priority
+        kwargs["tenant"] = tenant
+        kwargs["max_body_size"] = max_body_size
+        kwargs["raw"] = raw
+        if kwargs.get("headers"):
+            headers = {**self.headers, **kwargs["headers"]}
+        else:
+            headers = self.headers
+        if isinstance(path, EncodedURL):
+            url = EncodedURL(self.base_url + path)
+        else:
+            url = self.base_url + path
+        token = await self.auth_provider.get_token() if self.auth_provider else None
+        kwargs["headers"] = self._with_auth(headers, token)
+        try:
+            return await self._request(method, url, deadline, **kwargs)
+        except aiohttp.ClientResponseError as exception:
+            # Retry once with a fresh token, unless the body was a stream
+            # that has already been consumed
+            if (
+                token is None
+                or exception.status != 401
+                or isinstance(kwargs.get("data"), (Iterator, AsyncIterator))
+            ):
+                raise
+        self.auth_provider.invalidate(token)
+        token = await self.auth_provider.get_token()
+        kwargs["headers"] = self._with_auth(headers, token)
+        return await self._request(method, url, deadline, **kwargs)
+
+    def _with_auth(self, headers: dict, token: Optional[str]) -> dict:
+        """Add the auth provider's headers for the token to the headers"""
+        if token is None:
+            return headers
+        return {**headers, **self.auth_provider.auth_headers(token)}
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        deadline: Optional[Deadline],
+        priority: int = PRIORITY_NORMAL,
+        tenant: Hashable = None,
+        **kwargs,
+    ) -> Union[str, dict, list]:
+        """Make the HTTP call and verify the HTTP status code, waiting for
+        the scheduler and limiter first if they are set, and hedging the
+        call if the hedge policy allows it
+
+        :param method: The HTTP method / RESTful verb  to use
+        :param url: The full URL to call
+        :param deadline: The deadline the call must complete by, or None
+        :param priority: (optional): The priority class used by the scheduler
+        :param tenant: (optional): The caller or tenant used by the scheduler
+        :param kwargs: The collection of keyword arguments that the aiohttp
+            request method will accept
+        :return: Either the response string or decoded JSON object
+        """
+        if self._can_hedge(method, kwargs):
+            send = self._hedged_send
+        else:
+            send = self._limited_send
+        if self.scheduler is None:
+            return await send(method, url, deadline, **kwargs)
+        await self._wait_for_slot(self.scheduler.acquire(priority, tenant), deadline)
+        try:
+            return await send(method, url, deadline, **kwargs)
+        finally:
+            self.scheduler.release()
+
+    def _can_hedge(self, method: str, kwargs: dict) -> bool:
+        """Check if a call may be hedged.  Only idempotent calls without a
+        body are hedged, and never while using a cassette, so the recording
+        or replay order isn't changed"""
+        return (
+            self.hedge_policy is not None
+            and self.cassette is None
+            and method.upper() in ("GET", "HEAD")
+            and kwargs.get("data") is None
+            and kwargs.get("json") is None
+        )
+
+    async def _hedged_send(
+        self, method: str, url: str, deadline: Optional[Deadline], **kwargs
+    ) -> Union[str, dict, list]:
+        """Send the request, then send an identical hedge request if there's
+        no answer within the hedge policy's delay.  The first answer is
+        returned and the other request is cancelled.  A request that fails
+        without an HTTP response doesn't win while the other is still going.
+
+        :param method: The HTTP method / RESTful verb  to use
+        :param url: The full URL to call
+        :param deadline: The deadline the call must complete by, or None
+        :param kwargs: The collection of keyword arguments that the aiohttp
+            request method will accept
+        :return: Either the response string or decoded JSON object
+        """
+        policy = self.hedge_policy
+        policy.start()
+        delay = policy.delay()
+        start = time.monotonic()
+        primary = asyncio.ensure_future(
+            self._limited_send(method, url, deadline, **kwargs)
+        )
+        hedge = None
+        winner = None
+        pending = {primary}
+        try:
+            if delay is not None:
+                await asyncio.wait(pending, timeout=delay)
+                if not primary.done() and policy.allow_hedge():
+                    hedge = asyncio.ensure_future(
+                        self._limited_send(method, url, deadline, **kwargs)
+                    )
+                    pending.add(hedge)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # When both finish together an answer beats a failure, and
+                # the first request beats the hedge
+                task = min(done, key=lambda t: (self._outcome(t), t is not primary))
+                exception = task.exception()
+                if exception is None:
+                    # The time since the first request was sent is recorded
+                    # even if the hedge won, as the first request's latency
+                    # was at least that long.  Recording the hedge's own
+                    # latency would pull the delay down each time it wins
+                    policy.record(time.monotonic() - start, task is hedge)
+                if (
+                    exception is None
+                    or isinstance(exception, aiohttp.ClientResponseError)
+                    or not pending
+                ):
+                    winner = task
+                    return task.result()
+        finally:
+            await self._cancel_losers(winner, primary, hedge)
+
+    @staticmethod
+    def _outcome(task: asyncio.Future) -> int:
+        """Rank a finished request: 0 for an answer, 1 for an HTTP error
+        response and 2 for a failure without a response"""
+        exception = task.exception()
+        if exception is None:
+            return 0
+        return 1 if isinstance(exception, aiohttp.ClientResponseError) else 2
+
+    @staticmethod
+    async def _cancel_losers(
+        winner: Optional[asyncio.Future], *tasks: Optional[asyncio.Future]
+    ) -> None:
+        """Cancel the requests that are still running and wait for them to
+        finish, so their connections and limiter slots are released.  Losing
+        requests that already have a spilled body have it closed, so its
+        temporary file is deleted"""
+        running = []
+        results = []
+        for task in tasks:
+            if task is None or task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+                running.append(task)
+            elif not task.cancelled():
+                # Also marks the exception of a losing request as retrieved
+                if task.exception() is None:
+                    results.append(task.result())
+        if running:
+            results += await asyncio.gather(*running, return_exceptions=True)
+        for result in results:
+            if isinstance(result, RawResponse):
+                result = result.body
+            if isinstance(result, SpilledBody):
+                result.close()
+
+    async def _limited_send(
+        self, method: str, url: str, deadline: Optional[Deadline], **kwargs
+    ) -> Union[str, dict, list]:
+        """Send the request, waiting for the limiter first if one is set
+
+        :param method: The HTTP method / RESTful verb  to use
+        :param url: The full URL to call
+        :param deadline: The deadline the call must complete by, or None
+        :param kwargs: The collection of keyword arguments that the aiohttp
+            request method will accept
+        :return: Either the response string or decoded JSON object
+        """
+        if self.limiter is None:
+            return await self._send(method, url, deadline, **kwargs)
+        start = await self._wait_for_slot(self.limiter.acquire(), deadline)
+        overloaded = False
+        cancelled = False
+        try:
+            return await self._send(method, url, deadline, **kwargs)
+        except aiohttp.ClientResponseError as exception:
+            overloaded = exception.status in self.limiter.overload_statuses
+            raise
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError, OSError):
+            # An API that is timing out or dropping connections is overloaded
+            overloaded = True
+            raise
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            if cancelled:
+                self.limiter.discard()
+            else:
+                self.limiter.release(start, overloaded)
+
+    @staticmethod
+    async def _wait_for_slot(acquire: Awaitable, deadline: Optional[Deadline]) -> Any:
+        """Wait for the scheduler or limiter, with the waiting time coming
+        out of the deadline
+
+        :param acquire: The acquire coroutine to wait for
+        :param deadline: The deadline the call must complete by, or None
+        :return: The result of the acquire coroutine
+        """
+        if deadline:
+            return await asyncio.wait_for(acquire, deadline.remaining())
+        return await acquire
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        deadline: Optional[Deadline],
+        max_body_size: Optional[int] = None,
+        raw: bool = False,
+        **kwargs,
+    ) -> Union[str, dict, list, SpilledBody, RawResponse]:
+        """Send the request, or replay it from the cassette
+
+        :param method: The HTTP method / RESTful verb  to use
+        :param url: The full URL to call
+        :param deadline: The deadline the call must complete by, or None
+        :param max_body_size: (optional): The largest body allowed in bytes,
+            defaults to the max_body_size property
+        :param raw: (optional): Return a RawResponse instead of decoding the
+            body
+        :param kwargs: The collection of keyword arguments that the aiohttp
+            request method will accept
+        :return: Either the response string or decoded JSON object, or a
+            SpilledBody if the body was larger than the spill_threshold, or a
+            RawResponse if raw is set
+        """
+        if deadline:
+            if deadline.expired:
+                raise asyncio.TimeoutError("Deadline expired before request")
+            # The total timeout covers connect, send and reading the body
+            kwargs.setdefault(
+                "timeout", aiohttp.ClientTimeout(total=deadline.remaining())
+            )
+        if self.cassette is not None and not self.cassette.recording:
+            return await self._replay(method, url, kwargs.get("params"), raw)
+        start = time.monotonic()
+        request_url = self._encoded_url(url) if isinstance(url, EncodedURL) else url
+        if max_body_size is None:
+            max_body_size = self.max_body_size
+        async with self._session.request(method, request_url, **kwargs) as conn:
+            if conn.status in self.status_codes:
+                # Recorded bodies must be kept in memory
+                spill = None if self.cassette is not None else self.spill_threshold
+                body = await self._read_body(conn, BodyBuffer(max_body_size, spill))
+            else:
+                buffer = BodyBuffer(self.max_error_body, truncate=True)
+                body = await self._read_body(conn, buffer)
+            if self.cassette is not None:
+                self.cassette.record(
+                    method,
+                    url,
+                    kwargs.get("params"),
+                    conn.status,
+                    conn.headers,
+                    body,
+                    time.monotonic() - start,
+                )
             if conn.status not in self.status_codes:
                 raise aiohttp.ClientResponseError(
                     conn.request_info,
                     (conn,),
                     status=conn.status,
-                    message=await conn.text(),
+                    message=body.decode(self._encoding(conn), errors="replace"),
+                    headers=conn.headers,
                 )
+            if raw:
+                return RawResponse(conn.status, conn.headers, body)
+            if isinstance(body, SpilledBody):
+                return body
+            text = body.decode(self._encoding(conn))
             if conn.content_type == "application/json":
-                return await conn.json()
-            return await conn.text()
+                # Match aiohttp, which returns None for an empty JSON body
+                return json.loads(text) if text.strip() else None
+            return text
+
+    @staticmethod
+    async def _read_body(
+        conn: aiohttp.ClientResponse, buffer: BodyBuffer
+    ) -> Union[bytes, SpilledBody]:
+        """Read the response body into the buffer, stopping at its limit
+
+        :param conn: The response
+        :param buffer: The buffer with the size limits for the body
+        :return: The body bytes, or a SpilledBody if it was spilled
+        :raises ResponseTooLargeError: If the body is larger than the limit
+        """
+        if buffer.limit is None and buffer.spill_threshold is None:
+            return await conn.read()
+        buffer.check_length(conn.content_length)
+        try:
+            async for chunk in conn.content.iter_chunked(DEFAULT_CHUNK_SIZE):
+                if not buffer.write(chunk):
+                    break
+        except BaseException:
+            buffer.discard()
+            raise
+        return buffer.finish(conn.content_type, AsyncBaseWebAPI._encoding(conn))
+
+    @staticmethod
+    def _encoding(conn: aiohttp.ClientResponse) -> str:
+        """Get the character encoding of a response, defaulting to UTF-8 as
+        aiohttp does"""
+        try:
+            return codecs.lookup(conn.charset).name
+        except (LookupError, TypeError):
+            return "utf-8"
+
+    def _encoded_url(self, url: EncodedURL) -> URL:
+        """Create the yarl URL for an already encoded URL, using the base URL
+        parsed once rather than parsing the whole URL for every transaction
+
+        :param url: The full URL to call
+        :return: The yarl URL object
+        """
+        if self._parsed_base_url is None or self._parsed_base_url[0] != self.base_url:
+            self._parsed_base_url = (self.base_url, URL(self.base_url))
+        path = url[len(self.base_url) :]
+        if not url.startswith(self.base_url) or "?" in path or "#" in path:
+            return URL(url, encoded=True)
+        return self._parsed_base_url[1].with_path(path, encoded=True)
+
+    async def _replay(
+        self, method: str, url: str, params: Optional[dict], raw: bool = False
+    ) -> Union[str, dict, list, RawResponse]:
+        """Get the response from the cassette and verify the HTTP status code
+
+        :param method: The HTTP method / RESTful verb  to use
+        :param url: The full URL to call
+        :param params: The query parameters of the request
+        :param raw: (optional): Return a RawResponse instead of decoding the
+            body
+        :return: Either the response string or decoded JSON object, or a
+            RawResponse if raw is set
+        :raises KeyError: If the request was not recorded
+        """
+        interaction = self.cassette.find(method, url, params)
+        delay = self.cassette.delay(interaction)
+        if delay:
+            await asyncio.sleep(delay)
+        headers = CIMultiDict(interaction.headers)
+        content_type, _, options = headers.get("Content-Type", "").partition(";")
+        charset = options.partition("charset=")[2].strip() or "utf-8"
+        text = interaction.body.decode(charset, errors="replace")
+        if interaction.status not in self.status_codes:
+            request_info = aiohttp.RequestInfo(
+                URL(url), method.upper(), CIMultiDictProxy(CIMultiDict()), URL(url)
+            )
+            raise aiohttp.ClientResponseError(
+                request_info,
+                (),
+                status=interaction.status,
+                message=text,
+                headers=CIMultiDictProxy(headers),
+            )
+        if raw:
+            return RawResponse(
+                interaction.status, CIMultiDictProxy(headers), interaction.body
+            )
+        if content_type.strip().lower() == "application/json":
+            return json.loads(text)
+        return text
+
+    @staticmethod
+    def route(template: str) -> Route:
+        """Get a compiled path template for building transaction paths. The
+        template is parsed and encoded once and cached, so only the field
+        values are encoded for each transaction.
+
+        :param template: The path template, such as "/api/v2/pokemon/{name}/"
+        :return: The Route object, call its build method with the field values
+        """
+        return compile_route(template)
+
+    async def _upload(
+        self,
+        method: str,
+        path: str,
+        source: UploadSource,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: Optional[ProgressCallback] = None,
+        **kwargs,
+    ) -> Union[str, dict, list]:
+        """Stream a request body to the API with chunked transfer encoding,
+        without loading the whole payload into memory.
+
+        :param method: The HTTP method / RESTful verb  to use for this
+            transaction.
+        :param path: The path to the API object you wish to call.
+        :param source: A file path, bytes object, iterable of bytes chunks or
+            async iterable of bytes chunks to send as the request body
+        :param chunk_size: (optional): The chunk size to use when reading
+            files or bytes
+        :param progress: (optional): A callable taking the bytes sent so far
+            and the total size, or None if the total size is not known
+        :param kwargs: The collection of keyword arguments that the aiohttp
+            request method will accept, other than data
+        :return: Either the response string or decoded JSON object
+        :raises ValueError: If the source is not a supported type
+        :raises OSError: If the source is a file that can't be found
+        """
+        kwargs["data"] = astream_body(source, chunk_size, progress)
+        return await self._transaction(method, path, **kwargs)
+
+    async def _stored_transaction(
+        self,
+        method: str,
+        path: str,
+        json_class: Optional[type] = None,
+        max_age: Optional[float] = None,
+        **kwargs,
+    ) -> Union[str, dict, list]:
+        """Get a response from the response_store, only calling the API if
+        nothing has been stored.  Expired responses are still returned while
+        they are revalidated with the API in the background.
+
+        :param method: The HTTP method / RESTful verb  to use for this
+            transaction.
+        :param path: The path to the API object you wish to call.
+        :param json_class: (optional): A JSONBaseObject or JSONBaseList class
+            to create from the JSON data
+        :param max_age: (optional): The number of seconds the response is
+            fresh for, defaults to the max_age of the response_store
+        :param kwargs: The collection of keyword arguments that the aiohttp
+            request method will accept
+        :return: The decoded JSON object, JSON class or text
+        :raises ValueError: If the response_store property is not set, or the
+            request body is a stream
+        """
+        if not self.response_store:
+            raise ValueError("response_store must be set")
+        key = self.response_store.make_key(
+            method,
+            self.base_url + path,
+            kwargs.get("params"),
+            kwargs.get("headers"),
+            kwargs.get("json", kwargs.get("data")),
+        )
+        stored = self.response_store.get(key)
+        if stored is None:
+            stored = await self._store_response(key, method, path, max_age, **kwargs)
+        elif not stored.fresh and key not in self._revalidating:
+            # Keep a reference to the task so it isn't garbage collected
+            task = asyncio.ensure_future(
+                self._revalidate(key, method, path, max_age, **kwargs)
+            )
+            task.add_done_callback(functools.partial(self._revalidated, key))
+            self._revalidating[key] = task
+        return stored.decode(json_class)
+
+    async def _store_response(
+        self, key: str, method: str, path: str, max_age: Optional[float], **kwargs
+    ) -> StoredResponse:
+        """Call the API and save the response in the response_store"""
+        result = await self._transaction(method, path, raw=True, **kwargs)
+        body = result.body
+        if isinstance(body, SpilledBody):
+            with body:
+                body = body.read()
+        content_type = result.headers.get("Content-Type", "").split(";")[0]
+        return self.response_store.put(key, body, content_type, max_age)
+
+    async def _revalidate(
+        self, key: str, method: str, path: str, max_age: Optional[float], **kwargs
+    ) -> None:
+        """Refresh an expired response, keeping the stored one on failure"""
+        try:
+            await self._store_response(key, method, path, max_age, **kwargs)
+        except Exception:
+            pass
+
+    def _revalidated(self, key: str, task: asyncio.Task) -> None:
+        """Forget a finished revalidation.  This is a done callback, as a
+        task cancelled by close before it starts never runs its own code"""
+        if self._revalidating.get(key) is task:
+            del self._revalidating[key]
+
+    async def _delta_transaction(
+        self,
+        sync: DeltaSync,
+        path: str,
+        results_key: Optional[str] = None,
+        cursor_param: Optional[str] = None,
+        **kwargs,
+    ) -> Optional[Delta]:
+        """Fetch a collection with a conditional GET request and apply it to
+        a DeltaSync snapshot.  The sync's validators are sent with the
+        request and updated from the response, and nothing is applied when
+        the API answers 304 Not Modified.
+
+        :param sync: The DeltaSync holding the snapshot
+        :param path: The path to the collection
+        :param results_key: (optional): The key holding the items in the JSON
+            response, if they aren't the whole response
+        :param cursor_param: (optional): The query parameter for fetching
+            items updated since the last sync.  Once the sync has a cursor
+            the results are applied as a partial update
+        :param kwargs: The collection of keyword arguments that the aiohttp
+            request method will accept
+        :return: The Delta of changed items, or None if the collection was
+            not modified
+        """
+        kwargs["headers"] = {
+            **(kwargs.get("headers") or {}),
+            **sync.conditional_headers(),
+        }
+        cursor = sync.cursor_params(cursor_param) if cursor_param else {}
+        if cursor:
+            kwargs["params"] = {**(kwargs.get("params") or {}), **cursor}
+        try:
+            result = await self._transaction("get", path, raw=True, **kwargs)
+        except aiohttp.ClientResponseError as exception:
+            if exception.status != 304:
+                raise
+            sync.update_validators(exception.headers or {})
+            return None
+        sync.update_validators(result.headers)
+        if result.status == 304:
+            return None
+        if isinstance(result.body, SpilledBody):
+            with result.body as body:
+                data = body.json()
+        else:
+            data = json.loads(result.body)
+        if results_key:
+            data = data[results_key]
+        return sync.apply(data, partial=bool(cursor))
@@ -0,0 +1,124 @@
+"""Module containing the HedgePolicy class for cutting the tail latency of
+idempotent AsyncBaseWebAPI transactions
+"""
+
+from collections import deque
+from typing import Optional
+
+
+class HedgePolicy:
+    """Decide when AsyncBaseWebAPI sends a second, identical GET or HEAD
+    request for a transaction that is slow to answer.  The hedge is sent
+    once the transaction has taken longer than the chosen percentile of
+    recent latencies, the first response wins and the other request is
+    cancelled.  The number of hedges is limited by a budget, a fraction of
+    all transactions, so the extra load on the API stays bounded.  Assign an
+    instance to the hedge_policy property of an AsyncBaseWebAPI object.
+
+    :param percentile: (optional): The percentile of recent latencies to
+        wait before hedging
+    :param budget: (optional): The fraction of transactions that may be
+        hedged
+    :param window: (optional): The number of recent latencies to keep
+    :param min_samples: (optional): The number of latencies needed before
+        any transaction is hedged
+    :param min_delay: (optional): The shortest time in seconds to wait before
+        hedging
+    :cvar percentile: The percentile of recent latencies to wait
+    :cvar budget: The fraction of transactions that may be hedged
+    :cvar min_samples: The latencies needed before hedging starts
+    :cvar min_delay: The shortest time to wait before hedging
+    :cvar transactions: The number of transactions seen
+    :cvar hedges: The number of hedge requests sent
+    :cvar hedge_wins: The number of hedge requests that answered first
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        budget: float = 0.05,
+        window: int = 1000,
+        min_samples: int = 20,
+        min_delay: float = 0.0,
+    ) -> None:
+        if not 0 < percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+        if not 0 <= budget <= 1:
+            raise ValueError("budget must be between 0 and 1")
+        if window < 1 or min_samples < 1:
+            raise ValueError("window and min_samples must be at least 1")
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.transactions = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=window)
+        self._delay = None
+        self._stale = 0
+        # A small burst of hedges is allowed so the budget isn't only
+        # available one transaction at a time
+        self._tokens = 0.0
+        self._max_tokens = 10.0
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(delay={self.delay()}, "
+            f"hedges={self.hedges}, hedge_wins={self.hedge_wins})"
+        )
+
+    @property
+    def hedge_rate(self) -> float:
+        """The fraction of transactions that were hedged"""
+        return self.hedges / self.transactions if self.transactions else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        """The fraction of hedges that answered before the first request"""
+        return self.hedge_wins / self.hedges if self.hedges else 0.0
+
+    def delay(self) -> Optional[float]:
+        """Get the number of seconds to wait before hedging
+
+        :return: The delay, or None if there aren't enough latencies yet
+        """
+        if len(self._latencies) < self.min_samples:
+            return None
+        # Sorting the window for every transaction would be wasteful, so the
+        # percentile is only worked out again after a few new latencies
+        if self._delay is None or self._stale >= 16:
+            latencies = sorted(self._latencies)
+            index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+            self._delay = max(self.min_delay, latencies[index])
+            self._stale = 0
+        return self._delay
+
+    def start(self) -> None:
+        """Count a new transaction, adding its share of the budget"""
+        self.transactions += 1
+        self._tokens = min(self._max_tokens, self._tokens + self.budget)
+
+    def allow_hedge(self) -> bool:
+        """Take a hedge from the budget
+
+        :return: If a hedge may be sent
+        """
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self.hedges += 1
+        return True
+
+    def record(self, latency: float, hedge_won: bool = False) -> None:
+        """Record the latency of a completed transaction
+
+        :param latency: The number of seconds since the first request of
+            the transaction was sent
+        :param hedge_won: (optional): If the request was a hedge that
+            answered first
+        """
+        self._latencies.append(latency)
+        self._stale += 1
+        if hedge_won:
+            self.hedge_wins += 1
@@ -0,0 +1,159 @@
+"""Module containing the AdaptiveLimiter class for controlling how many
+transactions AsyncBaseWebAPI has in flight at once
+"""
+
+import asyncio
+import time
+from collections import deque
+
+
+class AdaptiveLimiter:
+    """Limit the number of concurrent transactions, adjusting the limit with
+    additive increase / multiplicative decrease (AIMD).  The limit grows by
+    about one for each limit's worth of healthy responses, and is cut by the
+    backoff factor when the API responds with an overloaded status, a
+    transaction times out or loses its connection, or latency rises above
+    the tolerated multiple of the baseline latency.  The baseline is the average latency of the first
+    window of responses, then a moving average updated by every response,
+    so APIs with fast and slow endpoints aren't treated as overloaded.
+    Assign an instance to the limiter property of an
+    AsyncBaseWebAPI object.
+
+    :param initial_limit: (optional): The starting concurrency limit
+    :param min_limit: (optional): The lowest the limit can be cut to
+    :param max_limit: (optional): The highest the limit can grow to
+    :param backoff: (optional): The factor the limit is multiplied by when
+        the API is overloaded
+    :param latency_tolerance: (optional): How many times the baseline
+        latency a response may take before it counts as overloaded
+    :param baseline_window: (optional): The number of responses averaged
+        for the baseline latency, before which latency isn't checked
+    :cvar min_limit: The lowest the limit can be cut to
+    :cvar max_limit: The highest the limit can grow to
+    :cvar backoff: The factor the limit is multiplied by when overloaded
+    :cvar latency_tolerance: Multiple of the baseline latency to tolerate
+    :cvar baseline_window: The number of responses averaged for the baseline
+    :cvar overload_statuses: HTTP status codes that mean the API is
+        overloaded
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        baseline_window: int = 20,
+    ) -> None:
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Expected 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        if baseline_window < 1:
+            raise ValueError("baseline_window must be at least 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.baseline_window = baseline_window
+        self.overload_statuses = (429, 503)
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._baseline = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(limit={self.limit}, "
+            f"in_flight={self.in_flight})"
+        )
+
+    @property
+    def limit(self) -> int:
+        """The current concurrency limit"""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """The number of transactions currently in flight"""
+        return self._in_flight
+
+    @property
+    def baseline_latency(self) -> float:
+        """The baseline latency in seconds, or None before any responses"""
+        return self._baseline
+
+    async def acquire(self) -> float:
+        """Wait until a transaction is allowed to start
+
+        :return: The start time to pass to release
+        """
+        if self._in_flight >= self.limit or self._waiters:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except BaseException:
+                if not waiter.cancelled() and waiter.done():
+                    # We were given a slot but are not going to use it
+                    self._in_flight -= 1
+                    self._wake()
+                elif waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+        else:
+            self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, start: float, overloaded: bool = False) -> None:
+        """Finish a transaction and adjust the limit
+
+        :param start: The start time returned by acquire
+        :param overloaded: If the API responded with an overloaded status,
+            or the transaction timed out or lost its connection
+        """
+        self._in_flight -= 1
+        now = time.monotonic()
+        latency = now - start
+        if self._samples >= self.baseline_window:
+            if latency > self._baseline * self.latency_tolerance:
+                overloaded = True
+            weight = 1 / self.baseline_window
+        else:
+            # Until the window is full the baseline is the plain average
+            self._samples += 1
+            weight = 1 / self._samples
+        # Every response moves the baseline, so it follows the mix of
+        # endpoints in use rather than sticking at the fastest one
+        if self._baseline is None:
+            self._baseline = latency
+        else:
+            self._baseline += (latency - self._baseline) * weight
+        if overloaded:
+            # Transactions that started before the last decrease were sent
+            # at the old limit, so only back off once for them
+            if start >= self._last_decrease:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_decrease = now
+        else:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        self._wake()
+
+    def discard(self) -> None:
+        """Finish a transaction that was cancelled before it was answered,
+        such as the losing request of a hedge.  Its slot is given up without
+        adjusting the limit, as it says nothing about the API's load.
+        """
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Start as many waiting transactions as the limit allows"""
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
@@ -0,0 +1,144 @@
+"""Module containing the PriorityScheduler class for sharing one
+AsyncBaseWebAPI object between latency sensitive and bulk transactions
+"""
+
+import asyncio
+import heapq
+import itertools
+from typing import Dict, Hashable, Optional
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+
+
+class SchedulerFullError(RuntimeError):
+    """Raised when a transaction is shed because the scheduler queue is
+    full"""
+
+
+class PriorityScheduler:
+    """Queue transactions when the concurrency limit is reached, starting
+    them in priority order.  Lower priority numbers always start first, and
+    within a priority, tenants share the capacity by weighted fair queuing.
+    When the queue is full, a new transaction replaces the lowest priority
+    queued transaction, or is rejected if there isn't one of lower priority.
+    Assign an instance to the scheduler property of an AsyncBaseWebAPI
+    object.
+
+    :param max_concurrency: (optional): The number of transactions that may
+        be in flight at once
+    :param max_queue_depth: (optional): The number of transactions that may
+        wait in the queue
+    :param weights: (optional): A dictionary of tenants and their share of
+        the capacity.  Tenants not listed have a weight of 1
+    :cvar max_concurrency: The number of transactions allowed in flight
+    :cvar max_queue_depth: The number of transactions allowed to wait
+    :cvar weights: The share of the capacity for each tenant
+    :cvar shed_count: The number of transactions shed since creation
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        max_queue_depth: int = 1000,
+        weights: Optional[Dict[Hashable, float]] = None,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if max_queue_depth < 0:
+            raise ValueError("max_queue_depth can not be negative")
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.weights = weights or {}
+        self.shed_count = 0
+        self._in_flight = 0
+        self._queued = 0
+        self._heap = []
+        self._counter = itertools.count()
+        self._virtual_time: Dict[int, float] = {}
+        self._finish_tags: Dict[tuple, float] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(in_flight={self.in_flight}, "
+            f"queue_depth={self.queue_depth})"
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """The number of transactions currently in flight"""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of transactions waiting to start"""
+        return self._queued
+
+    async def acquire(
+        self, priority: int = PRIORITY_NORMAL, tenant: Hashable = None
+    ) -> None:
+        """Wait until the transaction is allowed to start
+
+        :param priority: (optional): The priority class, lower numbers start
+            first
+        :param tenant: (optional): The caller or tenant the transaction is
+            for
+        :raises SchedulerFullError: If the transaction is shed
+        """
+        if self._in_flight < self.max_concurrency and not self._queued:
+            self._in_flight += 1
+            return
+        if self._queued >= self.max_queue_depth:
+            self._shed(priority)
+        # Weighted fair queuing: each transaction finishes a tenant's
+        # previous one plus the inverse of its weight in virtual time
+        virtual_time = self._virtual_time.get(priority, 0.0)
+        finish = max(virtual_time, self._finish_tags.get((priority, tenant), 0.0))
+        finish += 1 / self.weights.get(tenant, 1.0)
+        self._finish_tags[(priority, tenant)] = finish
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, finish, next(self._counter), waiter))
+        self._queued += 1
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled() and not waiter.exception():
+                # We were given a slot but are not going to use it
+                self.release()
+            elif not waiter.done() or waiter.cancelled():
+                self._queued -= 1
+            raise
+
+    def release(self) -> None:
+        """Finish a transaction and start the next queued one"""
+        self._in_flight -= 1
+        while self._heap and self._in_flight < self.max_concurrency:
+            priority, finish, _, waiter = heapq.heappop(self._heap)
+            if waiter.done():
+                # Cancelled or shed while queued
+                continue
+            self._queued -= 1
+            self._in_flight += 1
+            self._virtual_time[priority] = finish
+            waiter.set_result(None)
+        if not self._heap:
+            # Nothing is queued, so the fair queuing history can be reset
+            self._virtual_time.clear()
+            self._finish_tags.clear()
+
+    def _shed(self, priority: int) -> None:
+        """Make room in the queue for a transaction of the given priority
+
+        :param priority: The priority of the new transaction
+        :raises SchedulerFullError: If nothing queued has a lower priority
+        """
+        self.shed_count += 1
+        queued = [x for x in self._heap if not x[3].done()]
+        if queued:
+            worst = max(queued, key=lambda x: (x[0], x[1]))
+            if worst[0] > priority:
+                worst[3].set_exception(SchedulerFullError("Shed for higher priority"))
+                self._queued -= 1
+                return
+        raise SchedulerFullError("Scheduler queue is full")
@@ -0,0 +1,195 @@
+"""Pluggable token based authentication for the BaseWebAPI classes.  Tokens
+are cached and renewed in the background before they expire, and concurrent
+refreshes are collapsed into a single call to the sign in endpoint.
+
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class AuthProvider:
+    """Basic class for token based authentication with BaseWebAPI.  Override
+    the fetch_token method to call the API's sign in endpoint, then assign
+    an instance to the auth_provider property of the API object.
+
+    :param refresh_margin: (optional): The number of seconds before expiry
+        that a token will be renewed in the background
+    :cvar refresh_margin: The number of seconds before expiry to renew
+    """
+
+    def __init__(self, refresh_margin: float = 60.0) -> None:
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        # The lock guards the token and is only held briefly, while the fetch
+        # lock collapses concurrent fetches into one
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._refreshing = False
+
+    def fetch_token(self) -> Tuple[str, float]:
+        """Get a new token from the API.  This must be overridden
+
+        :return: The token and the number of seconds until it expires
+        """
+        raise NotImplementedError("fetch_token must be overridden")
+
+    def auth_headers(self, token: str) -> Dict[str, str]:
+        """Get the headers to send with a transaction.  Override this if the
+        API does not use bearer tokens
+
+        :param token: The current token
+        :return: A dictionary of headers
+        """
+        return {"Authorization": f"Bearer {token}"}
+
+    def get_token(self) -> str:
+        """Get a valid token, fetching a new one if required.  Tokens that
+        are close to expiry are still returned while a replacement is
+        fetched in the background
+
+        :return: The current token
+        """
+        now = time.monotonic()
+        token = self._token
+        if token is not None and now < self._expires_at:
+            if now >= self._expires_at - self.refresh_margin:
+                self._background_refresh()
+            return token
+        with self._fetch_lock:
+            # Another thread may have refreshed while we waited for the lock
+            with self._lock:
+                token = self._token
+                if token is not None and time.monotonic() < self._expires_at:
+                    return token
+            return self._refresh()
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """Discard the cached token, so the next transaction fetches a new
+        one.  If a token is given, it is only discarded if it is still the
+        current token, so many transactions failing with the same token only
+        cause one refresh.
+
+        :param token: (optional): The token that was rejected
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def _refresh(self) -> str:
+        """Fetch and store a new token. The fetch lock must be held, the
+        token lock is only taken to store the result
+
+        :return: The new token
+        """
+        token, expires_in = self.fetch_token()
+        with self._lock:
+            self._token = token
+            self._expires_at = time.monotonic() + expires_in
+        return token
+
+    def _background_refresh(self) -> None:
+        """Start renewing the token in a thread, unless already renewing"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_worker, daemon=True).start()
+
+    def _refresh_worker(self) -> None:
+        """Renew the token, keeping the current one if the renewal fails"""
+        try:
+            with self._fetch_lock:
+                self._refresh()
+        except Exception:
+            # The current token is still valid, so try again next time
+            pass
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+class AsyncAuthProvider:
+    """Basic class for token based authentication with AsyncBaseWebAPI.
+    Override the fetch_token coroutine to call the API's sign in endpoint,
+    then assign an instance to the auth_provider property of the API object.
+
+    :param refresh_margin: (optional): The number of seconds before expiry
+        that a token will be renewed in the background
+    :cvar refresh_margin: The number of seconds before expiry to renew
+    """
+
+    def __init__(self, refresh_margin: float = 60.0) -> None:
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_task = None
+
+    async def fetch_token(self) -> Tuple[str, float]:
+        """Get a new token from the API.  This must be overridden
+
+        :return: The token and the number of seconds until it expires
+        """
+        raise NotImplementedError("fetch_token must be overridden")
+
+    def auth_headers(self, token: str) -> Dict[str, str]:
+        """Get the headers to send with a transaction.  Override this if the
+        API does not use bearer tokens
+
+        :param token: The current token
+        :return: A dictionary of headers
+        """
+        return {"Authorization": f"Bearer {token}"}
+
+    async def get_token(self) -> str:
+        """Get a valid token, fetching a new one if required.  Tokens that
+        are close to expiry are still returned while a replacement is
+        fetched in the background
+
+        :return: The current token
+        """
+        now = time.monotonic()
+        if self._token is not None and now < self._expires_at:
+            if now >= self._expires_at - self.refresh_margin:
+                self._start_refresh()
+            return self._token
+        # Every caller waits on the same refresh task
+        await asyncio.shield(self._start_refresh())
+        return self._token
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """Discard the cached token, so the next transaction fetches a new
+        one.  If a token is given, it is only discarded if it is still the
+        current token, so many transactions failing with the same token only
+        cause one refresh.
+
+        :param token: (optional): The token that was rejected
+        """
+        if token is None or token == self._token:
+            self._token = None
+            self._expires_at = 0.0
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Get the running refresh task, starting one if required"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._refresh())
+            self._refresh_task.add_done_callback(self._refresh_done)
+        return self._refresh_task
+
+    @staticmethod
+    def _refresh_done(task: asyncio.Task) -> None:
+        """Retrieve the exception of a failed renewal, which nobody awaits
+        when it was started in the background.  The current token is kept,
+        so the renewal is tried again next time"""
+        if not task.cancelled():
+            task.exception()
+
+    async def _refresh(self) -> None:
+        """Fetch and store a new token"""
+        token, expires_in = await self.fetch_token()
+        self._token = token
+        self._expires_at = time.monotonic() + expires_in
@@ -1,7 +1,31 @@
 """Module containing the synchronous BaseWebAPI class
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import TYPE_CHECKING, Iterator, Optional, Union
+import threading
+import time
 import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+from .deadline import Deadline
+from .routes import Route, route as compile_route
+from .streaming import (
+    DEFAULT_CHUNK_SIZE,
+    BodyBuffer,
+    ProgressCallback,
+    SpilledBody,
+    UploadSource,
+    stream_body,
+)
+
+if TYPE_CHECKING:
+    # Only needed for annotations, so importing BaseWebAPI doesn't load
+    # asyncio, sqlite3 and gzip for features that may never be used
+    from .auth import AuthProvider
+    from .cassette import Cassette
+    from .delta import Delta, DeltaSync
+    from .response_store import ResponseStore, StoredResponse
 
 
 class BaseWebAPI:
@@ -27,6 +51,29 @@ class BaseWebAPI:
         locally installed CAs
     :cvar headers: Constructed headers to include with all transactions
     :cvar status_codes: List of acceptable status codes from the API service
+    :cvar timeout: The default number of seconds each transaction may take,
+        covering connect, send and read, or None for no limit
+    :cvar auth_provider: An AuthProvider object to add token headers to all
+        transactions, or None
+    :cvar response_store: A ResponseStore object used by _stored_transaction,
+        or None
+    :cvar cassette: A Cassette object to record transactions to or replay
+        transactions from, or None
+    :cvar max_body_size: The largest response body allowed in bytes, or None
+        for no limit
+    :cvar max_error_body: The number of bytes of an error response body to
+        keep, or None to keep all of it.  Setting it streams all response
+        bodies, as the status code isn't known until the response arrives
+    :cvar spill_threshold: The size in bytes above which response bodies are
+        written to a temporary file instead of memory, or None to keep them
+        in memory
+    :cvar session: The requests.Session whose pooled connections are used for
+        all transactions once warm_up has been called, or None to use a new
+        connection for each transaction
+    :cvar warmup_path: The path requested with HEAD to open connections
+    :cvar keepalive_interval: The number of seconds between HEAD requests that
+        keep the pooled connections open after warm_up, or None for no
+        keep-alive probes
     """
 
     def __init__(
@@ -51,6 +98,117 @@ class BaseWebAPI:
             self.base_url = f"{self.base_url}:{alt_port}"
         self.headers = {}
         self.status_codes = [200]
+        self.timeout = None
+        self.auth_provider: Optional["AuthProvider"] = None
+        self.response_store: Optional["ResponseStore"] = None
+        self._revalidating = set()
+        self._revalidating_lock = threading.Lock()
+        self.cassette: Optional["Cassette"] = None
+        self.max_body_size: Optional[int] = None
+        self.max_error_body: Optional[int] = None
+        self.spill_threshold: Optional[int] = None
+        self.session: Optional[requests.Session] = None
+        self.warmup_path = "/"
+        self.keepalive_interval: Optional[float] = None
+        # The pool size of the adapter warm_up mounted, or None if the
+        # session wasn't created by warm_up
+        self._pool_maxsize: Optional[int] = None
+        self._keepalive_stop: Optional[threading.Event] = None
+
+    def warm_up(self, connections: int = 1) -> int:
+        """Create the session if needed, then resolve the host and open
+        pooled keep-alive connections by sending concurrent HEAD requests for
+        the warmup_path.  The pool of a session created here grows to keep
+        all of the connections.  Failed requests are ignored, as the transactions
+        will report any real problem.  If keepalive_interval is set, the
+        connections are probed from a background thread until close is
+        called.
+
+        :param connections: (optional): The number of connections to open
+        :return: The number of requests that got a response
+        """
+        if self.session is None:
+            self.session = requests.Session()
+            self._pool_maxsize = 0
+        pool_maxsize = max(connections, DEFAULT_POOLSIZE)
+        if self._pool_maxsize is not None and pool_maxsize > self._pool_maxsize:
+            # A larger pool replaces the current one, as requests discards
+            # connections that don't fit when they are released
+            previous = self.session.adapters.get(self.base_url)
+            self.session.mount(self.base_url, HTTPAdapter(pool_maxsize=pool_maxsize))
+            self._pool_maxsize = pool_maxsize
+            if previous is not None:
+                previous.close()
+        if self.keepalive_interval and self._keepalive_stop is None:
+            self._keepalive_stop = threading.Event()
+            threading.Thread(
+                target=self._keep_alive,
+                args=(self._keepalive_stop, connections),
+                daemon=True,
+            ).start()
+        return self._probe_all(connections)
+
+    def _probe_all(self, connections: int) -> int:
+        """Send HEAD requests for the warmup_path from a thread each, so
+        the connections are opened in parallel.  Each response is held until
+        all have been sent so that each needs its own connection, then the
+        connections are released back to the pool
+
+        :param connections: The number of requests to send
+        :return: The number of requests that got a response
+        """
+        session = self.session
+        if (
+            session is None
+            or connections < 1
+            or (self.cassette is not None and not self.cassette.recording)
+        ):
+            return 0
+
+        def probe(_) -> Optional[requests.Response]:
+            try:
+                return session.head(
+                    self.base_url + self.warmup_path,
+                    verify=self.enforce_cert,
+                    timeout=self.timeout,
+                    allow_redirects=False,
+                    stream=True,
+                )
+            except requests.RequestException:
+                return None
+
+        responses = []
+        try:
+            with ThreadPoolExecutor(max_workers=connections) as pool:
+                for response in pool.map(probe, range(connections)):
+                    if response is not None:
+                        responses.append(response)
+        finally:
+            for response in responses:
+                # Reading the empty body first releases the connection to
+                # the pool instead of closing it
+                try:
+                    response.content
+                except requests.RequestException:
+                    pass
+                response.close()
+        return len(responses)
+
+    def _keep_alive(self, stop: threading.Event, connections: int) -> None:
+        """Probe the connections every keepalive_interval seconds until
+        close is called"""
+        while not stop.wait(self.keepalive_interval):
+            self._probe_all(connections)
+
+    def close(self) -> None:
+        """Stop the keep-alive probes and close the session's connections"""
+        if self._keepalive_stop is not None:
+            self._keepalive_stop.set()
+            self._keepalive_stop = None
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        self._pool_maxsize = None
 
     @staticmethod
     def _input_error_check(**kwargs) -> None:
@@ -62,7 +220,14 @@ class BaseWebAPI:
             if not isinstance(kwargs[var], bool):
                 raise ValueError(f"{var} must be a boolean")
 
-    def _transaction(self, method: str, path: str, **kwargs) -> requests.Response:
+    def _transaction(
+        self,
+        method: str,
+        path: str,
+        deadline: Union[Deadline, float, None] = None,
+        max_body_size: Optional[int] = None,
+        **kwargs,
+    ) -> requests.Response:
         """This method is purely to make the HTTP call and verify that the
         HTTP response code is in the accepted list defined in __init__
         be checked by the calling method as this will vary depending on the API.
@@ -73,24 +238,390 @@ class BaseWebAPI:
         :param path: The path to the API object you wish to call.  This is the
             path only starting with the first forward slash , as this function
             will add the protocol, hostname and port number appropriately
+        :param deadline: (optional): A Deadline shared with other
+            transactions, or the number of seconds this transaction may take.
+            Defaults to the timeout property
+        :param max_body_size: (optional): The largest response body allowed
+            in bytes, defaults to the max_body_size property
         :param kwargs: The collection of keyword arguments that the requests
             module will accept as documented at
-            http://docs.python-requests.org/en/master/api/#main-interface
+            http://docs.python-requests.org/en/master/api/#main-interface.
+            Any headers given are merged with the headers property
         :return: Requests response object
         :raises: (requests.RequestException, requests.ConnectionError,
             requests.HTTPError, requests.URLRequired,
             requests.TooManyRedirects, requests.ConnectTimeout,
-            requests.ReadTimeout)
+            requests.ReadTimeout, ResponseTooLargeError)
         """
 
+        deadline = Deadline.resolve(deadline, self.timeout)
         kwargs["verify"] = self.enforce_cert
-        kwargs["headers"] = self.headers
+        kwargs["max_body_size"] = max_body_size
+        if kwargs.get("headers"):
+            headers = {**self.headers, **kwargs["headers"]}
+        else:
+            headers = self.headers
         url = self.base_url + path
-        result = requests.request(method, url, **kwargs)
+        token = self.auth_provider.get_token() if self.auth_provider else None
+        kwargs["headers"] = self._with_auth(headers, token)
+        result = self._request(method, url, deadline, **kwargs)
+        if (
+            token is not None
+            and result.status_code == 401
+            and 401 not in self.status_codes
+            and not isinstance(kwargs.get("data"), Iterator)
+        ):
+            # Retry once with a fresh token, unless the body was a stream
+            # that has already been consumed
+            self.auth_provider.invalidate(token)
+            token = self.auth_provider.get_token()
+            kwargs["headers"] = self._with_auth(headers, token)
+            result = self._request(method, url, deadline, **kwargs)
         if result.status_code not in self.status_codes:
             raise requests.exceptions.HTTPError(
                 f"HTTP Status code "
                 f"{result.status_code} not in "
-                f"valid response codes"
+                f"valid response codes",
+                response=result,
             )
         return result
+
+    def _with_auth(self, headers: dict, token: Optional[str]) -> dict:
+        """Add the auth provider's headers for the token to the headers"""
+        if token is None:
+            return headers
+        return {**headers, **self.auth_provider.auth_headers(token)}
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        deadline: Optional[Deadline],
+        max_body_size: Optional[int] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """Make the HTTP call without any status code checks
+
+        :param method: The HTTP method / RESTful verb  to use
+        :param url: The full URL to call
+        :param deadline: The deadline the call must complete by, or None
+        :param max_body_size: (optional): The largest body allowed in bytes,
+            defaults to the max_body_size property
+        :param kwargs: The collection of keyword arguments that the requests
+            module will accept
+        :return: Requests response object
+        """
+        if self.cassette is not None and not self.cassette.recording:
+            return self._replay(method, url, kwargs.get("params"))
+        start = time.monotonic()
+        # The session's pooled connections are used once warmed up
+        requester = requests if self.session is None else self.session
+        if max_body_size is None:
+            max_body_size = self.max_body_size
+        if (
+            deadline
+            or max_body_size is not None
+            or self.max_error_body is not None
+            or self.spill_threshold is not None
+        ):
+            result = self._bounded_request(
+                requester, method, url, deadline, max_body_size, **kwargs
+            )
+        else:
+            result = requester.request(method, url, **kwargs)
+        # Streamed bodies are left for the caller to read
+        if self.cassette is not None and not kwargs.get("stream"):
+            self.cassette.record(
+                method,
+                url,
+                kwargs.get("params"),
+                result.status_code,
+                self._header_pairs(result),
+                result.content,
+                time.monotonic() - start,
+            )
+        return result
+
+    @staticmethod
+    def _header_pairs(result: requests.Response) -> list:
+        """Get the response headers as name and value pairs, keeping repeated
+        headers that requests joins into one value
+
+        :param result: The response
+        :return: The list of name and value pairs
+        """
+        headers = getattr(result.raw, "headers", None)
+        if hasattr(headers, "iteritems"):
+            return list(headers.iteritems())
+        return list(result.headers.items())
+
+    def _replay(
+        self, method: str, url: str, params: Optional[dict]
+    ) -> requests.Response:
+        """Create a response object from the cassette
+
+        :param method: The HTTP method / RESTful verb  to use
+        :param url: The full URL to call
+        :param params: The query parameters of the request
+        :return: Requests response object
+        :raises KeyError: If the request was not recorded
+        """
+        interaction = self.cassette.find(method, url, params)
+        delay = self.cassette.delay(interaction)
+        if delay:
+            time.sleep(delay)
+        result = requests.Response()
+        result.status_code = interaction.status
+        result.headers = requests.structures.CaseInsensitiveDict()
+        for name, value in interaction.headers:
+            # Repeated headers are joined as requests does
+            if name in result.headers:
+                value = f"{result.headers[name]}, {value}"
+            result.headers[name] = value
+        result.encoding = requests.utils.get_encoding_from_headers(result.headers)
+        result.url = url
+        result._content = interaction.body
+        return result
+
+    def _bounded_request(
+        self,
+        requester: Union[requests.Session, ModuleType],
+        method: str,
+        url: str,
+        deadline: Optional[Deadline],
+        max_body_size: Optional[int],
+        **kwargs,
+    ) -> requests.Response:
+        """Make the HTTP call within the time left on the deadline and the
+        body size limits.  The requests timeout only limits each socket
+        operation, so the body is streamed and the deadline and size checked
+        between chunks.  Error bodies are cut off at max_error_body, and
+        bodies larger than the spill_threshold are left in a SpilledBody as
+        the raw property of the response, so they are only read into memory
+        if the content is used.
+
+        :param requester: The requests module or a requests.Session
+        :param method: The HTTP method / RESTful verb  to use
+        :param url: The full URL to call
+        :param deadline: The deadline the whole call must complete by, or None
+        :param max_body_size: The largest body allowed in bytes, or None
+        :param kwargs: The collection of keyword arguments that the requests
+            module will accept
+        :return: Requests response object with the body already read
+        :raises requests.Timeout: If the deadline expires
+        :raises ResponseTooLargeError: If the body is larger than
+            max_body_size
+        """
+        if deadline:
+            if deadline.expired:
+                raise requests.exceptions.Timeout("Deadline expired before request")
+            kwargs.setdefault("timeout", deadline.remaining())
+        stream = kwargs.pop("stream", False)
+        result = requester.request(method, url, stream=True, **kwargs)
+        if stream:
+            return result
+        if result.status_code in self.status_codes:
+            # Recorded bodies must be kept in memory
+            spill = None if self.cassette is not None else self.spill_threshold
+            buffer = BodyBuffer(max_body_size, spill)
+        else:
+            buffer = BodyBuffer(self.max_error_body, truncate=True)
+        try:
+            buffer.check_length(self._content_length(result))
+            for chunk in result.iter_content(DEFAULT_CHUNK_SIZE):
+                if deadline and deadline.expired:
+                    raise requests.exceptions.ReadTimeout(
+                        "Deadline expired while reading response"
+                    )
+                if not buffer.write(chunk):
+                    break
+        except BaseException:
+            buffer.discard()
+            raise
+        finally:
+            # Release the connection back to the pool
+            result.close()
+        body = buffer.finish(
+            result.headers.get("Content-Type", ""), result.encoding or "utf-8"
+        )
+        if isinstance(body, SpilledBody):
+            result.raw = body
+            result._content = False
+            result._content_consumed = False
+        else:
+            result._content = body
+        return result
+
+    @staticmethod
+    def _content_length(result: requests.Response) -> Optional[int]:
+        """Get the Content-Length of a response, or None if it is missing or
+        not a valid number, as the body is still checked while it is read"""
+        try:
+            return int(result.headers["Content-Length"])
+        except (KeyError, ValueError):
+            return None
+
+    @staticmethod
+    def route(template: str) -> Route:
+        """Get a compiled path template for building transaction paths. The
+        template is parsed and encoded once and cached, so only the field
+        values are encoded for each transaction.
+
+        :param template: The path template, such as "/api/v2/pokemon/{name}/"
+        :return: The Route object, call its build method with the field values
+        """
+        return compile_route(template)
+
+    def _upload(
+        self,
+        method: str,
+        path: str,
+        source: UploadSource,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        progress: Optional[ProgressCallback] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """Stream a request body to the API with chunked transfer encoding,
+        without loading the whole payload into memory.
+
+        :param method: The HTTP method / RESTful verb  to use for this
+            transaction.
+        :param path: The path to the API object you wish to call.
+        :param source: A file path, bytes object or iterable of bytes chunks
+            to send as the request body
+        :param chunk_size: (optional): The chunk size to use when reading
+            files or bytes
+        :param progress: (optional): A callable taking the bytes sent so far
+            and the total size, or None if the total size is not known
+        :param kwargs: The collection of keyword arguments that the requests
+            module will accept, other than data
+        :return: Requests response object
+        :raises ValueError: If the source is not a supported type
+        :raises OSError: If the source is a file that can't be found
+        """
+        kwargs["data"] = stream_body(source, chunk_size, progress)
+        return self._transaction(method, path, **kwargs)
+
+    def _stored_transaction(
+        self,
+        method: str,
+        path: str,
+        json_class: Optional[type] = None,
+        max_age: Optional[float] = None,
+        **kwargs,
+    ) -> Union[str, dict, list]:
+        """Get a response from the response_store, only calling the API if
+        nothing has been stored.  Expired responses are still returned while
+        they are revalidated with the API in the background.
+
+        :param method: The HTTP method / RESTful verb  to use for this
+            transaction.
+        :param path: The path to the API object you wish to call.
+        :param json_class: (optional): A JSONBaseObject or JSONBaseList class
+            to create from the JSON data
+        :param max_age: (optional): The number of seconds the response is
+            fresh for, defaults to the max_age of the response_store
+        :param kwargs: The collection of keyword arguments that the requests
+            module will accept
+        :return: The decoded JSON object, JSON class or text
+        :raises ValueError: If the response_store property is not set, or the
+            request body is a stream
+        """
+        if not self.response_store:
+            raise ValueError("response_store must be set")
+        key = self.response_store.make_key(
+            method,
+            self.base_url + path,
+            kwargs.get("params"),
+            kwargs.get("headers"),
+            kwargs.get("json", kwargs.get("data")),
+        )
+        stored = self.response_store.get(key)
+        if stored is None:
+            stored = self._store_response(key, method, path, max_age, **kwargs)
+        elif not stored.fresh and self._start_revalidating(key):
+            threading.Thread(
+                target=self._revalidate,
+                args=(key, method, path, max_age),
+                kwargs=kwargs,
+                daemon=True,
+            ).start()
+        return stored.decode(json_class)
+
+    def _start_revalidating(self, key: str) -> bool:
+        """Mark a stored response as being revalidated
+
+        :param key: The response store key
+        :return: False if another thread is already revalidating it
+        """
+        with self._revalidating_lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+            return True
+
+    def _store_response(
+        self, key: str, method: str, path: str, max_age: Optional[float], **kwargs
+    ) -> "StoredResponse":
+        """Call the API and save the response in the response_store"""
+        result = self._transaction(method, path, **kwargs)
+        content_type = result.headers.get("Content-Type", "").split(";")[0]
+        return self.response_store.put(key, result.content, content_type, max_age)
+
+    def _revalidate(
+        self, key: str, method: str, path: str, max_age: Optional[float], **kwargs
+    ) -> None:
+        """Refresh an expired response, keeping the stored one on failure"""
+        try:
+            self._store_response(key, method, path, max_age, **kwargs)
+        except Exception:
+            pass
+        finally:
+            with self._revalidating_lock:
+                self._revalidating.discard(key)
+
+    def _delta_transaction(
+        self,
+        sync: "DeltaSync",
+        path: str,
+        results_key: Optional[str] = None,
+        cursor_param: Optional[str] = None,
+        **kwargs,
+    ) -> Optional["Delta"]:
+        """Fetch a collection with a conditional GET request and apply it to
+        a DeltaSync snapshot.  The sync's validators are sent with the
+        request and updated from the response, and nothing is applied when
+        the API answers 304 Not Modified.
+
+        :param sync: The DeltaSync holding the snapshot
+        :param path: The path to the collection
+        :param results_key: (optional): The key holding the items in the JSON
+            response, if they aren't the whole response
+        :param cursor_param: (optional): The query parameter for fetching
+            items updated since the last sync.  Once the sync has a cursor
+            the results are applied as a partial update
+        :param kwargs: The collection of keyword arguments that the requests
+            module will accept
+        :return: The Delta of changed items, or None if the collection was
+            not modified
+        """
+        kwargs["headers"] = {
+            **(kwargs.get("headers") or {}),
+            **sync.conditional_headers(),
+        }
+        cursor = sync.cursor_params(cursor_param) if cursor_param else {}
+        if cursor:
+            kwargs["params"] = {**(kwargs.get("params") or {}), **cursor}
+        try:
+            result = self._transaction("get", path, **kwargs)
+        except requests.exceptions.HTTPError as error:
+            if error.response is None or error.response.status_code != 304:
+                raise
+            result = error.response
+        sync.update_validators(result.headers)
+        if result.status_code == 304:
+            return None
+        data = result.json()
+        if results_key:
+            data = data[results_key]
+        return sync.apply(data, partial=bool(cursor))
@@ -0,0 +1,201 @@
+"""Record the request and response pairs made by the BaseWebAPI classes into
+a cassette file, then replay them without a network for deterministic tests
+and benchmarks of API client code.
+
+"""
+
+import base64
+import gzip
+import json
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+MODES = ("record", "replay")
+
+
+class Interaction(NamedTuple):
+    """A recorded request and response pair
+
+    :cvar method: The HTTP method of the request
+    :cvar url: The full URL of the request
+    :cvar params: The query parameters of the request
+    :cvar status: The HTTP status code of the response
+    :cvar headers: The headers of the response as name and value pairs, so
+        repeated headers such as Set-Cookie are all kept
+    :cvar body: The raw response body
+    :cvar elapsed: The number of seconds the response took
+    """
+
+    method: str
+    url: str
+    params: Optional[Dict]
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    elapsed: float
+
+    def to_json(self) -> Dict:
+        """Get the interaction as a JSON object for the cassette file"""
+        data = self._asdict()
+        try:
+            data["body"] = self.body.decode("utf-8")
+        except UnicodeDecodeError:
+            data["body"] = base64.b64encode(self.body).decode("ascii")
+            data["base64"] = True
+        return data
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "Interaction":
+        """Create an interaction from a JSON object in the cassette file"""
+        data = data.copy()
+        data["headers"] = [(name, value) for name, value in data["headers"]]
+        if data.pop("base64", False):
+            data["body"] = base64.b64decode(data["body"])
+        else:
+            data["body"] = data["body"].encode("utf-8")
+        return cls(**data)
+
+
+class Cassette:
+    """A gzipped file of recorded interactions.  Assign an instance to the
+    cassette property of an API object.  In record mode every transaction is
+    made as normal and recorded, and the file is written by save() or on
+    leaving the context manager.  In replay mode transactions are served
+    from the file and the network is never used.
+
+    Repeated requests for the same method, URL and parameters are replayed
+    in the order they were recorded, starting again from the first once all
+    have been used.  Streamed responses are not recorded, as their bodies
+    are read by the caller.
+
+    :param path: The path to the cassette file
+    :param mode: (optional): Either 'record' or 'replay'
+    :param latency: (optional): None to replay without delays, 'recorded' to
+        replay with the recorded response times, or a number of seconds to
+        delay every response by
+    :cvar mode: Either 'record' or 'replay'
+    :cvar latency: The replay delay setting
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        latency: Union[str, float, None] = None,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if latency is not None and latency != "recorded":
+            if not isinstance(latency, (int, float)) or isinstance(latency, bool):
+                raise ValueError("latency must be None, 'recorded' or a number")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._interactions: Dict[Tuple, List[Interaction]] = {}
+        self._positions: Dict[Tuple, int] = {}
+        if mode == "replay":
+            self.load()
+
+    def __enter__(self) -> "Cassette":
+        return self
+
+    def __exit__(self, *args) -> None:
+        if self.mode == "record":
+            self.save()
+
+    def __len__(self) -> int:
+        return sum(len(x) for x in self._interactions.values())
+
+    @property
+    def recording(self) -> bool:
+        """If the cassette is in record mode"""
+        return self.mode == "record"
+
+    @staticmethod
+    def _key(method: str, url: str, params: Optional[Dict]) -> Tuple:
+        """Create the lookup key for a request"""
+        return (
+            method.upper(),
+            url,
+            json.dumps(params or {}, sort_keys=True, default=str),
+        )
+
+    def load(self) -> None:
+        """Load the interactions from the cassette file"""
+        self._interactions = {}
+        self._positions = {}
+        with gzip.open(self.path, "rt", encoding="utf-8") as file_obj:
+            for line in file_obj:
+                self._add(Interaction.from_json(json.loads(line)))
+
+    def save(self) -> None:
+        """Write the interactions to the cassette file"""
+        with gzip.open(self.path, "wt", encoding="utf-8") as file_obj:
+            for interactions in self._interactions.values():
+                for interaction in interactions:
+                    file_obj.write(json.dumps(interaction.to_json()))
+                    file_obj.write("\n")
+
+    def _add(self, interaction: Interaction) -> None:
+        key = self._key(interaction.method, interaction.url, interaction.params)
+        self._interactions.setdefault(key, []).append(interaction)
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict],
+        status: int,
+        headers: Union[Mapping[str, str], Iterable[Tuple[str, str]]],
+        body: bytes,
+        elapsed: float,
+    ) -> None:
+        """Record a request and response pair
+
+        :param method: The HTTP method of the request
+        :param url: The full URL of the request
+        :param params: The query parameters of the request
+        :param status: The HTTP status code of the response
+        :param headers: The headers of the response, either a mapping or
+            name and value pairs.  A multidict's items include every
+            repeated header
+        :param body: The raw response body
+        :param elapsed: The number of seconds the response took
+        """
+        if isinstance(headers, Mapping):
+            headers = headers.items()
+        headers = [(name, value) for name, value in headers]
+        if params:
+            # Store the parameters as they will be loaded from the file
+            params = json.loads(json.dumps(params, default=str))
+        self._add(
+            Interaction(method.upper(), url, params, status, headers, body, elapsed)
+        )
+
+    def find(self, method: str, url: str, params: Optional[Dict]) -> Interaction:
+        """Get the next recorded response for a request
+
+        :param method: The HTTP method of the request
+        :param url: The full URL of the request
+        :param params: The query parameters of the request
+        :return: The recorded interaction
+        :raises KeyError: If the request was not recorded
+        """
+        key = self._key(method, url, params)
+        interactions = self._interactions.get(key)
+        if not interactions:
+            raise KeyError(f"No recorded response for {key[0]} {url}")
+        position = self._positions.get(key, 0)
+        self._positions[key] = (position + 1) % len(interactions)
+        return interactions[position]
+
+    def delay(self, interaction: Interaction) -> float:
+        """Get the number of seconds to wait before replaying a response
+
+        :param interaction: The interaction being replayed
+        :return: The delay in seconds
+        """
+        if self.latency is None:
+            return 0.0
+        if self.latency == "recorded":
+            return interaction.elapsed
+        return float(self.latency)
@@ -0,0 +1,57 @@
+"""A time budget that can be shared across several transactions, so that
+retries and pagination all draw from the same remaining time.
+
+"""
+
+import time
+from typing import Optional, Union
+
+
+class Deadline:
+    """Create a deadline a number of seconds from now.  Pass the same
+    Deadline object to each _transaction call that makes up one logical
+    operation, such as following pagination links, and each call will only
+    be allowed the time that remains.
+
+    :param seconds: The number of seconds until the deadline expires
+    :cvar expires_at: The time.monotonic() value the deadline expires at
+    """
+
+    def __init__(self, seconds: float) -> None:
+        if not isinstance(seconds, (int, float)) or isinstance(seconds, bool):
+            raise ValueError("seconds must be a number")
+        self.expires_at = time.monotonic() + seconds
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(remaining={self.remaining():.3f})"
+
+    def remaining(self) -> float:
+        """Get the number of seconds left before the deadline expires
+
+        :return: The seconds remaining, never less than zero
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """If the deadline has passed"""
+        return time.monotonic() >= self.expires_at
+
+    @classmethod
+    def resolve(
+        cls, deadline: Union["Deadline", float, None], default: Optional[float] = None
+    ) -> Optional["Deadline"]:
+        """Get a Deadline from a per call value, falling back to a per
+        instance default number of seconds
+
+        :param deadline: A Deadline object, a number of seconds or None
+        :param default: The number of seconds to use if deadline is None
+        :return: A Deadline object, or None if there is no time limit
+        """
+        if isinstance(deadline, Deadline):
+            return deadline
+        if deadline is None:
+            deadline = default
+        if deadline is None:
+            return None
+        return cls(deadline)
@@ -0,0 +1,165 @@
+"""A helper for keeping a local snapshot of a JSONBaseList collection up to
+date, so that each polling cycle only processes the items that changed.
+
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Hashable, Iterable, NamedTuple, Optional
+
+from .json_objects import JSONBaseList, JSONBaseObject
+
+
+class Delta(NamedTuple):
+    """The changes found by DeltaSync.apply
+
+    :cvar added: The items that were not in the snapshot
+    :cvar changed: The items whose content changed
+    :cvar removed: The items that were removed from the snapshot
+    """
+
+    added: JSONBaseList
+    changed: JSONBaseList
+    removed: JSONBaseList
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+class DeltaSync:
+    """Keep a snapshot of a collection keyed by one of its fields.  Each set
+    of items fetched from the API is compared with the snapshot by content
+    hash, and the snapshot is updated in place.
+
+    The _delta_transaction method of BaseWebAPI and AsyncBaseWebAPI fetches
+    a collection and applies it, handling conditional requests and cursors.
+    To make the requests yourself, send conditional_headers() with the
+    request, pass the response headers to update_validators() and call
+    apply() only when the response was not a 304.  If the API supports
+    fetching items updated since a time, send cursor_params() with the
+    request and apply the results with partial=True.
+
+    :param key_field: (optional): The field that uniquely identifies an item
+    :param item_class: (optional): The class to create items as
+    :param list_class: (optional): The class to create lists of items as
+    :param updated_field: (optional): The field holding the time an item was
+        last updated, used as the cursor for partial updates
+    :param deleted_field: (optional): The field that is true for items that
+        have been deleted, used to find removals in partial updates
+    :cvar snapshot: Dictionary of the current items by key
+    :cvar etag: The last ETag header seen, or None
+    :cvar last_modified: The last Last-Modified header seen, or None
+    :cvar cursor: The latest updated_field value seen, or None
+    """
+
+    def __init__(
+        self,
+        key_field: str = "id",
+        item_class: type = JSONBaseObject,
+        list_class: type = JSONBaseList,
+        updated_field: Optional[str] = None,
+        deleted_field: Optional[str] = None,
+    ) -> None:
+        self.key_field = key_field
+        self.item_class = item_class
+        self.list_class = list_class
+        self.updated_field = updated_field
+        self.deleted_field = deleted_field
+        self.snapshot: Dict[Hashable, JSONBaseObject] = {}
+        self.etag = None
+        self.last_modified = None
+        self.cursor = None
+        self._hashes: Dict[Hashable, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    @property
+    def items(self) -> JSONBaseList:
+        """The current snapshot as a list"""
+        return self.list_class(self.snapshot.values())
+
+    @staticmethod
+    def content_hash(item: Dict) -> bytes:
+        """Get a hash of an item's content that doesn't depend on key order
+
+        :param item: The JSON object
+        :return: The hash digest
+        """
+        encoded = json.dumps(
+            item, sort_keys=True, separators=(",", ":"), default=str
+        ).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=16).digest()
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Get the headers for a conditional request
+
+        :return: Dictionary of If-None-Match and If-Modified-Since headers
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update_validators(self, headers: Dict[str, str]) -> None:
+        """Store the validators from the response headers for the next
+        conditional request
+
+        :param headers: The response headers
+        """
+        self.etag = headers.get("ETag", self.etag)
+        self.last_modified = headers.get("Last-Modified", self.last_modified)
+
+    def cursor_params(self, param: str) -> Dict[str, Any]:
+        """Get the query parameters for fetching items updated since the
+        last sync
+
+        :param param: The name of the API's query parameter
+        :return: Dictionary of the query parameter, or empty before the first
+            sync
+        """
+        if self.cursor is None:
+            return {}
+        return {param: self.cursor}
+
+    def apply(self, data: Iterable[Dict], partial: bool = False) -> Delta:
+        """Compare items from the API with the snapshot and update it
+
+        :param data: The JSON list of items returned from the API
+        :param partial: (optional): If the items are only those updated since
+            the cursor, so missing items have not been removed
+        :return: The Delta of added, changed and removed items
+        :raises KeyError: If an item is missing the key field
+        """
+        added = self.list_class()
+        changed = self.list_class()
+        removed = self.list_class()
+        seen = set()
+        for raw in data:
+            key = raw[self.key_field]
+            if self.updated_field and raw.get(self.updated_field) is not None:
+                if self.cursor is None or raw[self.updated_field] > self.cursor:
+                    self.cursor = raw[self.updated_field]
+            if self.deleted_field and raw.get(self.deleted_field):
+                if key in self.snapshot:
+                    removed.append(self.snapshot.pop(key))
+                    del self._hashes[key]
+                continue
+            seen.add(key)
+            digest = self.content_hash(raw)
+            if self._hashes.get(key) == digest:
+                continue
+            item = self.item_class.from_json(dict(raw))
+            if key in self.snapshot:
+                changed.append(item)
+            else:
+                added.append(item)
+            self.snapshot[key] = item
+            self._hashes[key] = digest
+        if not partial:
+            for key in [x for x in self.snapshot if x not in seen]:
+                removed.append(self.snapshot.pop(key))
+                del self._hashes[key]
+        return Delta(added, changed, removed)
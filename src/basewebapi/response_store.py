@@ -0,0 +1,171 @@
+"""A persistent on-disk store of raw API responses, so that large and rarely
+changing reference data can be loaded at startup instead of downloaded again.
+
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, NamedTuple, Optional, Union
+
+
+class StoredResponse(NamedTuple):
+    """A raw response body held in a ResponseStore
+
+    :cvar body: The raw response body
+    :cvar content_type: The content type of the response body
+    :cvar stored_at: The time.time() the response was stored
+    :cvar expires_at: The time.time() the response should be revalidated
+    """
+
+    body: bytes
+    content_type: str
+    stored_at: float
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        """If the response has not expired yet"""
+        return time.time() < self.expires_at
+
+    def decode(self, json_class: Optional[type] = None) -> Union[str, dict, list]:
+        """Decode the body, optionally to a JSONBaseObject or JSONBaseList
+
+        :param json_class: (optional): The class to create from the JSON data
+        :return: The decoded JSON object, JSON class or text
+        """
+        if self.content_type == "application/json":
+            data = json.loads(self.body)
+            if json_class:
+                return json_class.from_json(data)
+            return data
+        return self.body.decode("utf-8")
+
+
+class ResponseStore:
+    """Persist raw response bodies with expiry times in an SQLite database.
+    Assign an instance to the response_store property of an API object, then
+    use the _stored_transaction method for reference data.  Reads are served
+    through SQLite's memory mapped I/O.
+
+    :param path: The path to the database file
+    :param max_age: (optional): The default number of seconds a stored
+        response is fresh for
+    :param mmap_size: (optional): The number of bytes of the database file
+        to memory map
+    :cvar max_age: The default number of seconds a stored response is fresh
+    """
+
+    def __init__(
+        self, path: str, max_age: float = 86400, mmap_size: int = 2**30
+    ) -> None:
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, body BLOB NOT NULL, content_type TEXT, "
+            "stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def __enter__(self) -> "ResponseStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def make_key(
+        method: str,
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        body: Any = None,
+    ) -> str:
+        """Create the key for a request.  Per-call headers such as Accept
+        and the request body are part of the key, as they change the
+        response
+
+        :param method: The HTTP method of the request
+        :param url: The full URL of the request
+        :param params: (optional): The query parameters of the request
+        :param headers: (optional): The per-call headers of the request
+        :param body: (optional): The data or JSON body of the request
+        :return: The key to store the response under
+        :raises ValueError: If the body is a stream, which can't be part of
+            a key
+        """
+        if isinstance(body, (Iterator, AsyncIterator)) or hasattr(body, "read"):
+            raise ValueError("Requests with streamed bodies can't be stored")
+        if isinstance(body, bytes):
+            body = body.hex()
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        request = json.dumps(
+            [method.upper(), url, params or {}, headers, body],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        """Get a stored response, whether it has expired or not
+
+        :param key: The key from make_key
+        :return: The StoredResponse, or None if nothing is stored
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, content_type, stored_at, expires_at "
+                "FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return StoredResponse(bytes(row[0]), row[1], row[2], row[3])
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        content_type: str,
+        max_age: Optional[float] = None,
+    ) -> StoredResponse:
+        """Store a response, replacing any previously stored response
+
+        :param key: The key from make_key
+        :param body: The raw response body
+        :param content_type: The content type of the response body
+        :param max_age: (optional): The number of seconds the response is
+            fresh for, defaults to the max_age property
+        :return: The StoredResponse
+        """
+        now = time.time()
+        if max_age is None:
+            max_age = self.max_age
+        stored = StoredResponse(body, content_type, now, now + max_age)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(body), content_type, now, now + max_age),
+            )
+            self._db.commit()
+        return stored
+
+    def delete(self, key: str) -> None:
+        """Remove a stored response
+
+        :param key: The key from make_key
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,98 @@
+"""Compiled path templates for building request paths with minimal work
+per transaction.
+
+"""
+
+from functools import lru_cache
+from string import Formatter
+from typing import Tuple
+from urllib.parse import quote
+
+# Characters allowed unencoded in the static parts of a path
+PATH_SAFE = "/:@!$&'()*+,;=-._~%?"
+
+
+class EncodedURL(str):
+    """A path or URL that has already been percent encoded, so the HTTP
+    library does not need to encode it again"""
+
+
+@lru_cache(maxsize=4096)
+def _quote_value(value: str) -> str:
+    """Percent encode a path parameter, caching common values"""
+    return quote(value, safe="")
+
+
+class Route:
+    """A path template such as "/api/v2/pokemon/{name}/" that is parsed and
+    encoded once, then filled in with build() for each transaction.
+    Parameter values are percent encoded so they can't change the path
+    structure.  Use the route() function to get a cached Route.
+
+    :param template: The path template, using str.format style fields
+    :cvar template: The path template
+    :cvar fields: The names of the fields in the template
+    """
+
+    def __init__(self, template: str) -> None:
+        if not isinstance(template, str):
+            raise ValueError("template must be a string")
+        self.template = template
+        fmt = []
+        fields = []
+        specs = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if conversion:
+                raise ValueError("Conversions are not supported in routes")
+            if field is not None and (not field or not field.isidentifier()):
+                raise ValueError("Route fields must be named")
+            fmt.append(quote(literal, safe=PATH_SAFE).replace("%", "%%"))
+            if field is not None:
+                fmt.append("%s")
+                fields.append(field)
+                specs.append(spec)
+        # The static parts are encoded once into a printf style template
+        self._format = "".join(fmt)
+        self._specs: Tuple = tuple(specs)
+        self.fields = tuple(fields)
+        self._plain = not any(specs)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.template!r})"
+
+    def build(self, **params) -> EncodedURL:
+        """Fill in the template
+
+        :param params: A value for each field in the template
+        :return: The encoded path
+        :raises KeyError: If a field's value is missing
+        """
+        if self._plain:
+            values = [params[field] for field in self.fields]
+        else:
+            values = [
+                format(params[field], spec) if spec else params[field]
+                for field, spec in zip(self.fields, self._specs)
+            ]
+        # Integers never need encoding, so skip the quoting cache for IDs
+        return EncodedURL(
+            self._format
+            % tuple(
+                [
+                    str(value) if type(value) is int else _quote_value(str(value))
+                    for value in values
+                ]
+            )
+        )
+
+    __call__ = build
+
+
+@lru_cache(maxsize=None)
+def route(template: str) -> Route:
+    """Get the compiled Route for a path template
+
+    :param template: The path template, using str.format style fields
+    :return: The Route object
+    """
+    return Route(template)
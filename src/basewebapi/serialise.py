@@ -0,0 +1,379 @@
+"""A compact binary format for passing decoded JSONBaseObject and JSONBaseList
+results between processes and caches.  Each dictionary is stored as a row of
+its values, with its class and keys written once in a table of shapes rather
+than once per object as pickle does.  The rows are packed with msgpack if it
+is installed (pip install basewebapi[msgpack]), or as compact JSON if not.
+Lists also store the offset of each item, so LazyJSONList can create single
+items from a memoryview without decoding the rest.
+
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Sequence
+from typing import Any, Callable, Dict, Iterator, Tuple, Union
+
+from .json_objects import JSONBaseList, JSONBaseObject
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIC = b"BWA\x03"
+FLAG_COMPRESSED = 1
+FLAG_MSGPACK = 2
+# Magic, flags and header length
+_PREFIX = struct.Struct("<4sBI")
+# The start of a msgpack array32, followed by the number of items
+_MSGPACK_ARRAY = struct.Struct(">BI")
+# Values of these types are stored as they are, anything else is encoded
+_SCALARS = frozenset((str, int, float, bool, type(None)))
+# Array type codes for the item offsets, by their size in bytes
+_OFFSET_TYPES = {4: "I", 8: "Q"}
+
+_encode = json.JSONEncoder(separators=(",", ":"), check_circular=False).encode
+
+
+def _class_path(cls: type) -> str:
+    """Get the import path of a class, checking it can be imported again"""
+    path = f"{cls.__module__}:{cls.__qualname__}"
+    try:
+        found = _resolve(path)
+    except ValueError:
+        found = None
+    if found is not cls:
+        raise ValueError(f"{cls.__qualname__} can't be found by its name")
+    return path
+
+
+def _resolve(path: str) -> type:
+    """Find a class from its path, only allowing JSON classes in modules
+    that have already been imported, so loading data never runs code"""
+    module_name, _, qualname = path.partition(":")
+    value = sys.modules.get(module_name)
+    try:
+        for name in qualname.split("."):
+            value = getattr(value, name)
+    except AttributeError:
+        raise ValueError(f"Unable to find {path}") from None
+    if value in (dict, list) or (
+        isinstance(value, type) and issubclass(value, (JSONBaseObject, JSONBaseList))
+    ):
+        return value
+    raise ValueError(f"{path} is not a JSON class")
+
+
+def _encoder() -> Tuple[Callable, Callable, Dict, Dict]:
+    """Build a function that converts a value to rows and one that gets the
+    index of a class, with the tables of classes and shapes they fill in.
+    A dictionary becomes a list of its values followed by its shape's
+    index, and a list becomes a list of its items followed by its class's
+    index, stored as a negative number.  The index is last so loading can
+    pop it off and use the rest of the row as it is."""
+    classes = {}
+    shapes = {}
+    # The markers of list classes, looked up for every list
+    lists = {}
+
+    def class_index(cls: type) -> int:
+        index = classes.get(cls)
+        if index is None:
+            _class_path(cls)
+            index = classes[cls] = len(classes)
+        return index
+
+    def encode(value: Any) -> Any:
+        cls = value.__class__
+        if isinstance(value, dict):
+            key = (cls, tuple(value))
+            marker = shapes.get(key)
+            if marker is None:
+                class_index(cls)
+                marker = shapes[key] = len(shapes)
+            values = value.values()
+        elif isinstance(value, (list, tuple)):
+            marker = lists.get(cls)
+            if marker is None:
+                # Tuples are stored as lists, as they are by json
+                marker = lists[cls] = ~class_index(list if cls is tuple else cls)
+            values = value
+        else:
+            # Left for msgpack or json to store, or raise TypeError
+            return value
+        row = [v if v.__class__ in _SCALARS else encode(v) for v in values]
+        row.append(marker)
+        return row
+
+    return encode, class_index, classes, shapes
+
+
+def _object_factory(cls: type, keys: Tuple[str, ...]) -> Callable:
+    """Build a function that creates an object of a shape from its values"""
+    if cls is dict:
+
+        def create(values: list) -> Dict:
+            return dict(zip(keys, values))
+
+    else:
+        new = cls.__new__
+
+        def create(values: list) -> Dict:
+            # Objects are filled in directly rather than running __init__
+            # again, as the values have already been validated
+            obj = new(cls)
+            dict.update(obj, zip(keys, values))
+            return obj
+
+    return create
+
+
+def _list_factory(cls: type) -> Callable:
+    """Build a function that creates a list of a class from its items"""
+    if cls is list:
+        return lambda items: items
+    if not issubclass(cls, list):
+
+        def invalid(items: list) -> list:
+            raise ValueError("Invalid row")
+
+        return invalid
+    new = cls.__new__
+
+    def create(items: list) -> list:
+        obj = new(cls)
+        list.extend(obj, items)
+        return obj
+
+    return create
+
+
+def _decoder(header: Dict) -> Callable:
+    """Build a function that converts a row back to its original class from
+    the tables in the header.  Any lists in the row must already have been
+    converted, as msgpack does when calling it for each array it unpacks"""
+    try:
+        classes = [_resolve(path) for path in header["classes"]]
+        shapes = [(classes[index], tuple(keys)) for index, keys in header["shapes"]]
+        list_class = classes[header["list"]] if "list" in header else list
+    except (KeyError, IndexError, TypeError):
+        raise ValueError("Invalid header") from None
+    if not issubclass(list_class, list):
+        raise ValueError("Invalid header")
+    if not all(issubclass(cls, dict) for cls, _ in shapes):
+        raise ValueError("Invalid header")
+    objects = [_object_factory(cls, keys) for cls, keys in shapes]
+    lists = [_list_factory(cls) for cls in classes]
+
+    def decode(row: list) -> Union[Dict, list]:
+        marker = row.pop()
+        if marker < 0:
+            return lists[~marker](row)
+        return objects[marker](row)
+
+    return decode
+
+
+def _pack_items(items: list, marker: int, binary: bool) -> Tuple[bytes, array]:
+    """Pack each item on its own so its offset is known.  The body is still
+    a single row for the list, so loads can unpack it in one call"""
+    if binary:
+        pack = msgpack.Packer().pack
+        packed = [pack(item) for item in items]
+        prefix = _MSGPACK_ARRAY.pack(0xDD, len(packed) + 1)
+        body = prefix + b"".join(packed) + pack(marker)
+        separator = 0
+    else:
+        packed = [_encode(item).encode("utf-8") for item in items]
+        prefix = b"["
+        body = prefix + b"".join(item + b"," for item in packed)
+        body += _encode(marker).encode("utf-8") + b"]"
+        separator = 1
+    offsets = array("Q", [len(prefix)])
+    position = len(prefix)
+    for item in packed:
+        position += len(item) + separator
+        offsets.append(position)
+    return body, offsets
+
+
+def _offsets_to_bytes(offsets: array) -> Tuple[bytes, int]:
+    """Convert the item offsets to little endian bytes, using 32 bit
+    offsets unless the body is too big for them, and return the size"""
+    if offsets[-1] < 2**32:
+        offsets = array(_OFFSET_TYPES[4], offsets)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return offsets.tobytes(), offsets.itemsize
+
+
+def _offsets_from_bytes(data: memoryview, size: int) -> array:
+    """Convert little endian bytes to the item offsets"""
+    offsets = array(_OFFSET_TYPES[size])
+    offsets.frombytes(data)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return offsets
+
+
+def _dumps(value: Union[Dict, list], compress: bool, binary: bool) -> bytes:
+    """Serialise a value, packing the rows with msgpack or JSON"""
+    encode, class_index, classes, shapes = _encoder()
+    header = {}
+    if isinstance(value, list):
+        header["list"] = class_index(value.__class__)
+        items = [v if v.__class__ in _SCALARS else encode(v) for v in value]
+        payload, offsets = _pack_items(items, ~header["list"], binary)
+        table, header["offset_size"] = _offsets_to_bytes(offsets)
+        header["count"] = len(items)
+        payload = table + payload
+    elif binary:
+        payload = msgpack.packb(encode(value))
+    else:
+        payload = _encode(encode(value)).encode("utf-8")
+    header["classes"] = [_class_path(cls) for cls in classes]
+    header["shapes"] = [[classes[cls], list(keys)] for cls, keys in shapes]
+    flags = FLAG_MSGPACK if binary else 0
+    if compress:
+        flags |= FLAG_COMPRESSED
+        payload = zlib.compress(payload, 1)
+    header = _encode(header).encode("utf-8")
+    return _PREFIX.pack(MAGIC, flags, len(header)) + header + payload
+
+
+def dumps(value: Union[JSONBaseObject, JSONBaseList], compress: bool = False) -> bytes:
+    """Serialise a JSON object or list, keeping the classes of it and any
+    child objects.  Only the dictionary and list contents are kept, and
+    __init__ is not run again when loading.
+
+    :param value: The object or list to serialise, which may only contain
+        JSON types
+    :param compress: (optional): Compress the values with zlib, which makes
+        the data much smaller but means LazyJSONList has to decompress all
+        of it first
+    :return: The serialised bytes
+    :raises ValueError: If a class can't be found by its module and name
+    :raises TypeError: If the value contains types JSON can't represent
+    """
+    if not isinstance(value, (dict, list)):
+        raise ValueError("Expected dictionary or list object")
+    if msgpack is not None:
+        try:
+            return _dumps(value, compress, True)
+        except OverflowError:
+            # msgpack only has 64 bit integers, while JSON has no limit
+            pass
+    return _dumps(value, compress, False)
+
+
+def _read(data: Union[bytes, bytearray, memoryview]) -> Tuple[Dict, memoryview, bool]:
+    """Read the header and return it with a view of the payload and if it
+    was packed with msgpack"""
+    view = memoryview(data).cast("B")
+    if len(view) < _PREFIX.size:
+        raise ValueError("Data is too short")
+    magic, flags, header_length = _PREFIX.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("Data is not in the basewebapi format")
+    header_end = _PREFIX.size + header_length
+    header = json.loads(bytes(view[_PREFIX.size : header_end]))
+    payload = view[header_end:]
+    if flags & FLAG_COMPRESSED:
+        payload = memoryview(zlib.decompress(payload))
+    binary = bool(flags & FLAG_MSGPACK)
+    if binary and msgpack is None:
+        raise ValueError("msgpack must be installed to load this data")
+    return header, payload, binary
+
+
+def _walk(row: list, decode: Callable) -> Union[Dict, list]:
+    """Convert the rows loaded from JSON, innermost first as msgpack does"""
+    return decode([_walk(v, decode) if type(v) is list else v for v in row])
+
+
+def _unpack(data: memoryview, binary: bool, decode: Callable) -> Any:
+    """Unpack a value packed with msgpack or JSON, converting its rows"""
+    if binary:
+        return msgpack.unpackb(data, list_hook=decode)
+    value = json.loads(bytes(data))
+    return _walk(value, decode) if type(value) is list else value
+
+
+def loads(data: Union[bytes, bytearray, memoryview]) -> Union[Dict, list]:
+    """Load a value serialised by dumps
+
+    :param data: The serialised bytes
+    :return: The object or list, with its original classes
+    :raises ValueError: If the data is not valid, or refers to classes that
+        aren't JSON classes in modules that have been imported, or was
+        packed with msgpack and it isn't installed
+    """
+    header, payload, binary = _read(data)
+    decode = _decoder(header)
+    try:
+        if "count" in header:
+            payload = payload[(header["count"] + 1) * header["offset_size"] :]
+        return _unpack(payload, binary, decode)
+    except (KeyError, IndexError, TypeError):
+        raise ValueError("Invalid data") from None
+
+
+class LazyJSONList(Sequence):
+    """A read only view of a list serialised by dumps, that only decodes
+    and creates the items that are used.  The data is not copied, so it can
+    be a memoryview of a shared memory block or a memory map.
+
+    :param data: The serialised bytes of a list
+    :raises ValueError: If the data is not a valid serialised list
+    """
+
+    def __init__(self, data: Union[bytes, bytearray, memoryview]) -> None:
+        header, payload, self._binary = _read(data)
+        if "count" not in header or "list" not in header:
+            raise ValueError("Data is not a serialised list")
+        size = header.get("offset_size")
+        if size not in _OFFSET_TYPES:
+            raise ValueError("Invalid header")
+        table_size = (header["count"] + 1) * size
+        self._offsets = _offsets_from_bytes(payload[:table_size], size)
+        self._body = payload[table_size:]
+        self._decode = _decoder(header)
+        self._list_marker = ~header["list"]
+        # Rows are separated by commas when stored as JSON
+        self._separator = 0 if self._binary else 1
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            result = self._decode([self._list_marker])
+            list.extend(result, (self[i] for i in range(*index.indices(len(self)))))
+            return result
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        start = self._offsets[index]
+        end = self._offsets[index + 1] - self._separator
+        try:
+            return _unpack(self._body[start:end], self._binary, self._decode)
+        except (IndexError, TypeError):
+            raise ValueError("Invalid data") from None
+
+    def __iter__(self) -> Iterator:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(<{len(self)} items>)"
+
+    def materialise(self) -> Union[JSONBaseList, list]:
+        """Decode every item into a list of the original class
+
+        :return: The list
+        """
+        return self[:]
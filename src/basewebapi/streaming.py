@@ -0,0 +1,328 @@
+"""Helpers for sending large request bodies as a stream of chunks, so that
+uploads use a constant amount of memory regardless of the payload size, and
+for reading response bodies within size limits, spilling large bodies to
+temporary files.
+
+"""
+
+import json
+import mmap
+import os
+import tempfile
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+UploadSource = Union[str, os.PathLike, bytes, Iterable[bytes], AsyncIterable[bytes]]
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def file_chunks(
+    path: Union[str, os.PathLike], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Read a file in chunks through a memory map, so only the chunk being
+    sent is resident in memory
+
+    :param path: The path to the file to read
+    :param chunk_size: The number of bytes to read for each chunk
+    :return: Generator of byte chunks
+    """
+    with open(path, "rb") as file_obj:
+        size = os.fstat(file_obj.fileno()).st_size
+        if not size:
+            # Zero length files can not be memory mapped
+            return
+        with mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, size, chunk_size):
+                yield mapped[offset : offset + chunk_size]
+
+
+def _source_size(source: UploadSource) -> Optional[int]:
+    """Get the total size of the upload source if it can be known in advance"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    return None
+
+
+def stream_body(
+    source: UploadSource,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> Iterator[bytes]:
+    """Create a generator for sending a request body with chunked transfer
+    encoding.  The source is checked straight away rather than when the
+    body starts being sent
+
+    :param source: A file path, bytes object or iterable of bytes chunks
+    :param chunk_size: The chunk size to use when reading files or bytes
+    :param progress: (optional): A callable taking the bytes sent so far and
+        the total size, or None if the total size is not known
+    :return: Generator of byte chunks
+    :raises ValueError: If the source is not a supported type
+    :raises OSError: If the source is a file that can't be found
+    """
+    total = _source_size(source)
+    if isinstance(source, (str, os.PathLike)):
+        chunks = file_chunks(source, chunk_size)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        chunks = (
+            bytes(view[offset : offset + chunk_size])
+            for offset in range(0, len(view), chunk_size)
+        )
+    elif isinstance(source, Iterable):
+        chunks = iter(source)
+    else:
+        raise ValueError("Expected a file path, bytes or an iterable of bytes")
+    return _counted_chunks(chunks, total, progress)
+
+
+def _counted_chunks(
+    chunks: Iterator[bytes],
+    total: Optional[int],
+    progress: Optional[ProgressCallback],
+) -> Iterator[bytes]:
+    """Yield the chunks, reporting the bytes sent to the progress callback"""
+    sent = 0
+    for chunk in chunks:
+        sent += len(chunk)
+        yield chunk
+        if progress:
+            progress(sent, total)
+
+
+def astream_body(
+    source: UploadSource,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[bytes]:
+    """Create an async generator for sending a request body with chunked
+    transfer encoding.  The source is checked straight away rather than
+    when the body starts being sent
+
+    :param source: A file path, bytes object, iterable of bytes chunks or
+        async iterable of bytes chunks
+    :param chunk_size: The chunk size to use when reading files or bytes
+    :param progress: (optional): A callable taking the bytes sent so far and
+        the total size, or None if the total size is not known
+    :return: Async generator of byte chunks
+    :raises ValueError: If the source is not a supported type
+    :raises OSError: If the source is a file that can't be found
+    """
+    if isinstance(source, AsyncIterable):
+        return _acounted_chunks(source, progress)
+    return _async_chunks(stream_body(source, chunk_size, progress))
+
+
+async def _async_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Yield the chunks of a synchronous generator"""
+    for chunk in chunks:
+        yield chunk
+
+
+async def _acounted_chunks(
+    chunks: AsyncIterable[bytes], progress: Optional[ProgressCallback]
+) -> AsyncIterator[bytes]:
+    """Yield the chunks, reporting the bytes sent to the progress callback"""
+    sent = 0
+    async for chunk in chunks:
+        sent += len(chunk)
+        yield chunk
+        if progress:
+            progress(sent, None)
+
+
+class ResponseTooLargeError(ValueError):
+    """Raised when a response body is larger than the allowed size
+
+    :param limit: The allowed size in bytes
+    :cvar limit: The allowed size in bytes
+    """
+
+    def __init__(self, limit: int) -> None:
+        super().__init__(f"Response body is larger than {limit} bytes")
+        self.limit = limit
+
+
+class SpilledBody:
+    """A response body that was larger than the spill threshold, held in a
+    temporary file that is deleted when closed.  Read it as a stream with
+    read() or iter_chunks(), or map it into memory with mmap().
+
+    :param file_obj: The temporary file holding the body
+    :param size: The size of the body in bytes
+    :param content_type: (optional): The content type of the response
+    :param encoding: (optional): The character encoding of the response
+    :cvar size: The size of the body in bytes
+    :cvar content_type: The content type of the response
+    :cvar encoding: The character encoding of the response
+    """
+
+    def __init__(
+        self,
+        file_obj: BinaryIO,
+        size: int,
+        content_type: str = "",
+        encoding: str = "utf-8",
+    ) -> None:
+        self._file = file_obj
+        self.size = size
+        self.content_type = content_type
+        self.encoding = encoding
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(size={self.size})"
+
+    def __enter__(self) -> "SpilledBody":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def read(self, size: int = -1) -> bytes:
+        """Read from the current position in the body
+
+        :param size: (optional): The number of bytes to read, or -1 for the
+            rest of the body
+        :return: The bytes read
+        """
+        return self._file.read(size)
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+        """Read the whole body in chunks
+
+        :param chunk_size: (optional): The number of bytes in each chunk
+        :return: Generator of byte chunks
+        """
+        self._file.seek(0)
+        return iter(lambda: self._file.read(chunk_size), b"")
+
+    def mmap(self) -> mmap.mmap:
+        """Map the body into memory, so it can be sliced without reading it
+
+        :return: A read only memory map of the body
+        """
+        return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def text(self) -> str:
+        """Read the whole body as a string
+
+        :return: The decoded body
+        """
+        self._file.seek(0)
+        return self._file.read().decode(self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        """Read the whole body as JSON
+
+        :return: The decoded JSON object
+        """
+        self._file.seek(0)
+        return json.load(self._file)
+
+    def close(self) -> None:
+        """Close and delete the temporary file"""
+        self._file.close()
+
+
+class BodyBuffer:
+    """Collect a response body chunk by chunk within a size limit, moving it
+    to a temporary file once it is larger than the spill threshold
+
+    :param limit: (optional): The largest body allowed in bytes, or None for
+        no limit
+    :param spill_threshold: (optional): The size in bytes above which the
+        body is written to a temporary file, or None to keep it in memory
+    :param truncate: (optional): Stop collecting at the limit instead of
+        raising ResponseTooLargeError, for capturing error bodies
+    :cvar size: The number of bytes collected
+    :cvar truncated: If the body was cut off at the limit
+    """
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        spill_threshold: Optional[int] = None,
+        truncate: bool = False,
+    ) -> None:
+        self.limit = limit
+        self.spill_threshold = spill_threshold
+        self.truncate = truncate
+        self.size = 0
+        self.truncated = False
+        self._chunks: List[bytes] = []
+        self._file = None
+
+    def check_length(self, length: Optional[int]) -> None:
+        """Reject a body before reading it if its declared length is too
+        large
+
+        :param length: The Content-Length of the response, or None
+        :raises ResponseTooLargeError: If the length is larger than the limit
+        """
+        if (
+            length is not None
+            and self.limit is not None
+            and not self.truncate
+            and length > self.limit
+        ):
+            raise ResponseTooLargeError(self.limit)
+
+    def write(self, chunk: bytes) -> bool:
+        """Add a chunk to the body
+
+        :param chunk: The bytes read from the response
+        :return: False if the limit has been reached and the rest of the
+            body should not be read
+        :raises ResponseTooLargeError: If the body is larger than the limit
+        """
+        if self.limit is not None and self.size + len(chunk) > self.limit:
+            if not self.truncate:
+                raise ResponseTooLargeError(self.limit)
+            chunk = chunk[: self.limit - self.size]
+            self.truncated = True
+        self.size += len(chunk)
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._chunks.append(chunk)
+            if self.spill_threshold is not None and self.size > self.spill_threshold:
+                self._file = tempfile.TemporaryFile()
+                self._file.writelines(self._chunks)
+                self._chunks = []
+        return not self.truncated
+
+    def finish(
+        self, content_type: str = "", encoding: str = "utf-8"
+    ) -> Union[bytes, SpilledBody]:
+        """Get the collected body
+
+        :param content_type: (optional): The content type of the response
+        :param encoding: (optional): The character encoding of the response
+        :return: The body bytes, or a SpilledBody if it was spilled
+        """
+        if self._file is None:
+            return b"".join(self._chunks)
+        self._file.seek(0)
+        return SpilledBody(self._file, self.size, content_type, encoding)
+
+    def discard(self) -> None:
+        """Delete the temporary file if the body was spilled"""
+        if self._file is not None:
+            self._file.close()
@@ -1,7 +1,148 @@
-from unittest import IsolatedAsyncioTestCase
-from basewebapi.asyncbasewebapi import AsyncBaseWebAPI
+from unittest import IsolatedAsyncioTestCase, mock
+from basewebapi import JSONBaseList
+from basewebapi.asyncbasewebapi import (
+    PRIORITY_BULK,
+    PRIORITY_HIGH,
+    AdaptiveLimiter,
+    AsyncBaseWebAPI,
+    HedgePolicy,
+    PriorityScheduler,
+    SchedulerFullError,
+)
+from basewebapi.auth import AsyncAuthProvider
+from basewebapi.cassette import Cassette
+from basewebapi.delta import DeltaSync
+from basewebapi.response_store import ResponseStore
+from basewebapi.streaming import ResponseTooLargeError, SpilledBody
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 import aiohttp
 import asyncio
+import os
+import tempfile
+
+
+# A local aiohttp server for the tests that need to inspect what was sent,
+# rather than hammering servers on the network
+
+hits_key = web.AppKey("hits", dict)
+
+
+async def upload_handler(request: web.Request) -> web.Response:
+    body = await request.read()
+    return web.json_response(
+        {
+            "length": len(body),
+            "chunked": request.headers.get("Transfer-Encoding") == "chunked",
+        }
+    )
+
+
+async def slow_handler(request: web.Request) -> web.Response:
+    await asyncio.sleep(1)
+    return web.Response(text="slow")
+
+
+async def auth_handler(request: web.Request) -> web.Response:
+    if request.headers.get("Authorization") != "Bearer token2":
+        raise web.HTTPUnauthorized()
+    return web.Response(text="authorised")
+
+
+class ExpiringAuthProvider(AsyncAuthProvider):
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def fetch_token(self):
+        self.calls += 1
+        return f"token{self.calls}", 3600
+
+
+async def catalogue_handler(request: web.Request) -> web.Response:
+    request.app[hits_key]["catalogue"] += 1
+    return web.json_response([{"name": "Foo"}, {"name": "Bar"}])
+
+
+async def cookies_handler(request: web.Request) -> web.Response:
+    response = web.Response(text="cookies")
+    response.headers.add("Set-Cookie", "first=1")
+    response.headers.add("Set-Cookie", "second=2")
+    return response
+
+
+async def busy_handler(request: web.Request) -> web.Response:
+    raise web.HTTPServiceUnavailable()
+
+
+async def drop_handler(request: web.Request) -> web.Response:
+    # Close the connection without answering
+    request.transport.close()
+    return web.Response()
+
+
+async def echo_handler(request: web.Request) -> web.Response:
+    return web.json_response(
+        {"raw_path": request.raw_path, "value": request.match_info["value"]}
+    )
+
+
+async def flaky_handler(request: web.Request) -> web.Response:
+    # Only the first request is slow
+    request.app[hits_key]["flaky"] += 1
+    if request.app[hits_key]["flaky"] == 1:
+        await asyncio.sleep(1)
+    return web.Response(text=f"flaky {request.app[hits_key]['flaky']}")
+
+
+big_body = b"x" * 200000
+
+
+async def big_handler(request: web.Request) -> web.Response:
+    status = 500 if request.query.get("error") else 200
+    if not request.query.get("chunked"):
+        return web.Response(body=big_body, status=status)
+    # Streamed without a Content-Length
+    response = web.StreamResponse(status=status)
+    await response.prepare(request)
+    for offset in range(0, len(big_body), 10000):
+        await response.write(big_body[offset : offset + 10000])
+    await response.write_eof()
+    return response
+
+
+async def collection_handler(request: web.Request) -> web.Response:
+    # A collection that only changes for conditional requests
+    if request.headers.get("If-None-Match") == '"v1"':
+        return web.Response(status=304, headers={"ETag": '"v1"'})
+    return web.json_response(
+        {"results": [{"id": 1, "name": "Foo"}]}, headers={"ETag": '"v1"'}
+    )
+
+
+async def root_handler(request: web.Request) -> web.Response:
+    # Record the client port to count the connections used
+    request.app[hits_key]["peers"].append(request.transport.get_extra_info("peername"))
+    return web.Response(text="root")
+
+
+def local_app() -> web.Application:
+    app = web.Application()
+    app[hits_key] = {"catalogue": 0, "flaky": 0, "peers": []}
+    app.router.add_get("/", root_handler)
+    app.router.add_post("/upload", upload_handler)
+    app.router.add_get("/slow", slow_handler)
+    app.router.add_get("/auth", auth_handler)
+    app.router.add_get("/catalogue", catalogue_handler)
+    app.router.add_get("/busy", busy_handler)
+    app.router.add_get("/drop", drop_handler)
+    app.router.add_get("/cookies", cookies_handler)
+    app.router.add_get("/flaky", flaky_handler)
+    app.router.add_get("/big", big_handler)
+    app.router.add_get("/collection", collection_handler)
+    app.router.add_get("/echo/{value}/", echo_handler)
+    return app
 
 
 class TestAsyncBaseWebAPI(IsolatedAsyncioTestCase):
@@ -175,3 +316,306 @@ class TestAsyncBaseWebAPI(IsolatedAsyncioTestCase):
             result = await conn._transaction("get", "/basic-auth/fakeuser/nopass")
             self.assertEqual(result["authenticated"], True)
             self.assertEqual(result["user"], "fakeuser")
+
+
+class TestAsyncBaseWebAPILocal(IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self) -> None:
+        self.server = TestServer(local_app(), host="127.0.0.1")
+        await self.server.start_server()
+        self.obj = AsyncBaseWebAPI(
+            "127.0.0.1", "nouser", "nopass", alt_port=str(self.server.port)
+        )
+
+    async def asyncTearDown(self) -> None:
+        await self.obj.close()
+        await self.server.close()
+
+    async def test_upload(self) -> None:
+        # Check async generators are streamed with chunked transfer encoding
+        async def chunks():
+            for _ in range(10):
+                yield b"x" * 1024
+
+        progress = []
+        async with self.obj as conn:
+            result = await conn._upload(
+                "post", "/upload", chunks(), progress=lambda s, t: progress.append(s)
+            )
+        self.assertEqual({"length": 10240, "chunked": True}, result)
+        self.assertEqual(10240, progress[-1])
+
+    async def test_deadline(self) -> None:
+        # Check the instance timeout and per call deadlines cut off slow
+        # responses
+        async with self.obj as conn:
+            conn.timeout = 0.1
+            with self.assertRaises(asyncio.TimeoutError):
+                await conn._transaction("get", "/slow")
+            conn.timeout = None
+            with self.assertRaises(asyncio.TimeoutError):
+                await conn._transaction("get", "/slow", deadline=0.1)
+            self.assertEqual("slow", await conn._transaction("get", "/slow"))
+
+    async def test_auth_provider(self) -> None:
+        # Check concurrent requests rejected with the same token only
+        # refresh it once
+        async with self.obj as conn:
+            conn.auth_provider = ExpiringAuthProvider()
+            results = await asyncio.gather(
+                *[conn._transaction("get", "/auth") for _ in range(5)]
+            )
+            self.assertEqual(["authorised"] * 5, results)
+            self.assertEqual(2, conn.auth_provider.calls)
+
+    async def test_stored_transaction(self) -> None:
+        # Check stored responses are used instead of calling the API, and
+        # expired responses are revalidated in the background
+        async with self.obj as conn:
+            conn.response_store = ResponseStore(":memory:")
+            result = await conn._stored_transaction(
+                "get", "/catalogue", JSONBaseList, max_age=-1
+            )
+            self.assertIsInstance(result, JSONBaseList)
+            self.assertEqual(2, len(result))
+            self.assertEqual(1, self.server.app[hits_key]["catalogue"])
+            await conn._stored_transaction("get", "/catalogue")
+            await asyncio.gather(*conn._revalidating.values())
+            self.assertEqual(2, self.server.app[hits_key]["catalogue"])
+            await conn._stored_transaction("get", "/catalogue")
+            self.assertEqual(2, self.server.app[hits_key]["catalogue"])
+            # The raw body and its real content type are stored
+            await conn._stored_transaction("get", "/big")
+            stored = conn.response_store.get(
+                conn.response_store.make_key("get", conn.base_url + "/big")
+            )
+            self.assertEqual(big_body, stored.body)
+            self.assertEqual("application/octet-stream", stored.content_type)
+            # A revalidation cancelled by close before it starts is forgotten
+            await conn._stored_transaction("get", "/cookies", max_age=-1)
+            await conn._stored_transaction("get", "/cookies")
+            self.assertEqual(1, len(conn._revalidating))
+        await asyncio.sleep(0.01)
+        self.assertEqual({}, self.obj._revalidating)
+
+    async def test_cassette(self) -> None:
+        # Record transactions from the local server, then replay them after
+        # the server has gone
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cassette.gz")
+            async with self.obj as conn:
+                with Cassette(path, "record") as cassette:
+                    conn.cassette = cassette
+                    await conn._transaction("get", "/catalogue")
+                    await conn._transaction("get", "/slow")
+                    await conn._transaction("get", "/cookies")
+                    with self.assertRaises(aiohttp.ClientResponseError):
+                        await conn._transaction("get", "/auth")
+            await self.server.close()
+            async with self.obj as conn:
+                conn.cassette = Cassette(path)
+                result = await conn._transaction("get", "/catalogue")
+                self.assertEqual([{"name": "Foo"}, {"name": "Bar"}], result)
+                self.assertEqual("slow", await conn._transaction("get", "/slow"))
+                result = await conn._send(
+                    "get", conn.base_url + "/cookies", None, raw=True
+                )
+                self.assertEqual(
+                    ["first=1", "second=2"], result.headers.getall("Set-Cookie")
+                )
+                with self.assertRaises(aiohttp.ClientResponseError) as context:
+                    await conn._transaction("get", "/auth")
+                self.assertEqual(401, context.exception.status)
+
+    async def test_limiter(self) -> None:
+        # Check healthy responses raise the limit and overloaded responses
+        # cut it
+        async with self.obj as conn:
+            conn.limiter = AdaptiveLimiter(initial_limit=4, latency_tolerance=100)
+            await asyncio.gather(
+                *[conn._transaction("get", "/catalogue") for _ in range(20)]
+            )
+            self.assertGreater(conn.limiter.limit, 4)
+            limit = conn.limiter.limit
+            with self.assertRaises(aiohttp.ClientResponseError):
+                await conn._transaction("get", "/busy")
+            self.assertEqual(int(limit * conn.limiter.backoff), conn.limiter.limit)
+            self.assertEqual(0, conn.limiter.in_flight)
+            # Dropped connections cut the limit too
+            limit = conn.limiter.limit
+            with self.assertRaises(aiohttp.ClientConnectionError):
+                await conn._transaction("get", "/drop")
+            self.assertEqual(int(limit * conn.limiter.backoff), conn.limiter.limit)
+            self.assertEqual(0, conn.limiter.in_flight)
+
+    async def test_scheduler(self) -> None:
+        # Check transactions pass through the scheduler and are shed when
+        # the queue is full
+        async with self.obj as conn:
+            conn.scheduler = PriorityScheduler(max_concurrency=2, max_queue_depth=2)
+            calls = [
+                conn._transaction("get", "/catalogue", priority=PRIORITY_BULK)
+                for _ in range(4)
+            ]
+            calls.append(conn._transaction("get", "/catalogue", priority=PRIORITY_HIGH))
+            results = await asyncio.gather(*calls, return_exceptions=True)
+            self.assertIsInstance(results[3], SchedulerFullError)
+            self.assertEqual([{"name": "Foo"}, {"name": "Bar"}], results[4])
+            self.assertEqual(0, conn.scheduler.in_flight)
+
+    async def test_route(self) -> None:
+        # Check encoded route paths are sent without being encoded again
+        async with self.obj as conn:
+            echo = conn.route("/echo/{value}/")
+            result = await conn._transaction("get", echo.build(value="a b%/c"))
+            self.assertEqual("/echo/a%20b%25%2Fc/", result["raw_path"])
+            self.assertEqual("a b%/c", result["value"])
+            result = await conn._transaction(
+                "get", echo.build(value="d"), params={"q": "1"}
+            )
+            self.assertEqual("/echo/d/?q=1", result["raw_path"])
+
+    async def test_warm_up(self) -> None:
+        # Check the connections opened on open are used by transactions
+        self.obj.warmup_connections = 3
+        peers = self.server.app[hits_key]["peers"]
+        async with self.obj as conn:
+            self.assertEqual(3, len(set(peers)))
+            await asyncio.gather(*[conn._transaction("get", "/") for _ in range(3)])
+            self.assertEqual(6, len(peers))
+            self.assertEqual(3, len(set(peers)))
+
+    async def test_keep_alive(self) -> None:
+        # Check probes are sent until the session is closed
+        self.obj.keepalive_interval = 0.05
+        peers = self.server.app[hits_key]["peers"]
+        async with self.obj as conn:
+            await asyncio.sleep(0.3)
+            self.assertGreater(len(peers), 2)
+            self.assertEqual(1, len(set(peers)))
+        probes = len(peers)
+        await asyncio.sleep(0.15)
+        self.assertEqual(probes, len(peers))
+        self.assertIsNone(conn._keepalive_task)
+
+    async def test_hedge_policy(self) -> None:
+        # Check a slow request is hedged and the hedge's answer is used
+        async with self.obj as conn:
+            conn.hedge_policy = HedgePolicy(min_samples=1, budget=1.0)
+            conn.hedge_policy.record(0.05)
+            conn.limiter = AdaptiveLimiter(initial_limit=10, baseline_window=1)
+            start = asyncio.get_running_loop().time()
+            self.assertEqual("flaky 2", await conn._transaction("get", "/flaky"))
+            self.assertLess(asyncio.get_running_loop().time() - start, 0.5)
+            self.assertEqual(1, conn.hedge_policy.hedges)
+            self.assertEqual(1, conn.hedge_policy.hedge_wins)
+            # The latency is recorded from when the first request was sent
+            self.assertGreaterEqual(max(conn.hedge_policy._latencies), 0.05)
+            self.assertEqual(2, len(conn.hedge_policy._latencies))
+            # The cancelled request doesn't count as overload
+            self.assertEqual(0, conn.limiter.in_flight)
+            self.assertEqual(10, conn.limiter.limit)
+            # Fast answers and non idempotent requests aren't hedged
+            self.assertEqual("flaky 3", await conn._transaction("get", "/flaky"))
+            with self.assertRaises(aiohttp.ClientResponseError):
+                await conn._transaction("post", "/flaky")
+            self.assertEqual(1, conn.hedge_policy.hedges)
+            self.assertEqual(2, conn.hedge_policy.transactions)
+
+    async def test_hedge_simultaneous(self) -> None:
+        # Check the hedge's answer wins when the first request fails without
+        # a response at the same moment
+        released = asyncio.Event()
+        calls = []
+
+        async def send(method, url, deadline, **kwargs):
+            calls.append(url)
+            first = len(calls) == 1
+            await released.wait()
+            if first:
+                raise aiohttp.ServerDisconnectedError()
+            return "hedge"
+
+        self.obj.hedge_policy = HedgePolicy(min_samples=1, budget=1.0)
+        self.obj.hedge_policy.record(0.05)
+        asyncio.get_running_loop().call_later(0.1, released.set)
+        with mock.patch.object(self.obj, "_limited_send", send):
+            result = await self.obj._hedged_send("get", "/flaky", None)
+        self.assertEqual("hedge", result)
+        self.assertEqual(2, len(calls))
+
+    async def test_cancel_losers(self) -> None:
+        # Check a losing request's spilled body is closed, but not the
+        # winner's
+        loop = asyncio.get_running_loop()
+        bodies = []
+        tasks = []
+        for _ in range(2):
+            bodies.append(SpilledBody(tempfile.TemporaryFile(), 0))
+            tasks.append(loop.create_future())
+            tasks[-1].set_result(bodies[-1])
+        await AsyncBaseWebAPI._cancel_losers(tasks[0], *tasks)
+        self.assertFalse(bodies[0]._file.closed)
+        self.assertTrue(bodies[1]._file.closed)
+        bodies[0].close()
+
+    async def test_hedge_budget(self) -> None:
+        # Check slow requests wait for the first answer once the budget is
+        # spent
+        async with self.obj as conn:
+            conn.hedge_policy = HedgePolicy(min_samples=1, budget=0.0)
+            conn.hedge_policy.record(0.05)
+            self.assertEqual("flaky 1", await conn._transaction("get", "/flaky"))
+            self.assertEqual(0, conn.hedge_policy.hedges)
+
+    async def test_max_body_size(self) -> None:
+        # Check bodies over the limit are rejected, from the Content-Length
+        # or while streaming
+        async with self.obj as conn:
+            conn.max_body_size = 1000
+            for params in ({}, {"chunked": "1"}):
+                with self.assertRaises(ResponseTooLargeError):
+                    await conn._transaction("get", "/big", params=params)
+            result = await conn._transaction("get", "/big", max_body_size=len(big_body))
+            self.assertEqual(len(big_body), len(result))
+
+    async def test_error_body(self) -> None:
+        # Check error bodies are cut off at max_error_body
+        async with self.obj as conn:
+            conn.max_error_body = 100
+            with self.assertRaises(aiohttp.ClientResponseError) as context:
+                await conn._transaction(
+                    "get", "/big", params={"error": "1", "chunked": "1"}
+                )
+            self.assertEqual("x" * 100, context.exception.message)
+
+    async def test_spill(self) -> None:
+        # Check large bodies are returned in a temporary file
+        async with self.obj as conn:
+            conn.spill_threshold = 1000
+            with await conn._transaction(
+                "get", "/big", params={"chunked": "1"}
+            ) as result:
+                self.assertIsInstance(result, SpilledBody)
+                self.assertEqual(len(big_body), result.size)
+                self.assertEqual(big_body, b"".join(result.iter_chunks()))
+                with result.mmap() as mapped:
+                    self.assertEqual(big_body[:10], mapped[:10])
+            # Small bodies are still decoded
+            result = await conn._transaction("get", "/catalogue")
+            self.assertEqual([{"name": "Foo"}, {"name": "Bar"}], result)
+
+    async def test_delta_transaction(self) -> None:
+        # Check the validators are sent and a 304 applies nothing
+        sync = DeltaSync()
+        async with self.obj as conn:
+            delta = await conn._delta_transaction(sync, "/collection", "results")
+            self.assertEqual([{"id": 1, "name": "Foo"}], delta.added)
+            self.assertEqual('"v1"', sync.etag)
+            result = await conn._delta_transaction(sync, "/collection", "results")
+            self.assertIsNone(result)
+            self.assertEqual(1, len(sync))
+            raw = await conn._transaction("get", "/collection", raw=True)
+            self.assertEqual(200, raw.status)
+            self.assertEqual('"v1"', raw.headers["ETag"])
+            self.assertIsInstance(raw.body, bytes)
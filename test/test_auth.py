@@ -0,0 +1,117 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+from concurrent.futures import ThreadPoolExecutor
+from basewebapi.auth import AsyncAuthProvider, AuthProvider
+import asyncio
+import gc
+import time
+
+
+class CountingAuthProvider(AuthProvider):
+
+    def __init__(self, expires_in=3600, **kwargs):
+        super().__init__(**kwargs)
+        self.expires_in = expires_in
+        self.calls = 0
+        self.delay = 0.05
+
+    def fetch_token(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return f"token{self.calls}", self.expires_in
+
+
+class AsyncCountingAuthProvider(AsyncAuthProvider):
+
+    def __init__(self, expires_in=3600, **kwargs):
+        super().__init__(**kwargs)
+        self.expires_in = expires_in
+        self.calls = 0
+        self.fail = False
+
+    async def fetch_token(self):
+        if self.fail:
+            raise ConnectionError("Sign in failed")
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return f"token{self.calls}", self.expires_in
+
+
+class TestAuthProvider(TestCase):
+
+    def test_not_implemented(self):
+        self.assertRaises(NotImplementedError, AuthProvider().get_token)
+
+    def test_single_flight(self):
+        # Concurrent requests for a token only sign in once
+        provider = CountingAuthProvider()
+        with ThreadPoolExecutor(8) as pool:
+            tokens = list(pool.map(lambda _: provider.get_token(), range(8)))
+        self.assertEqual(["token1"] * 8, tokens)
+        self.assertEqual(1, provider.calls)
+        self.assertEqual(
+            {"Authorization": "Bearer token1"}, provider.auth_headers("token1")
+        )
+
+    def test_invalidate(self):
+        provider = CountingAuthProvider()
+        provider.get_token()
+        # A stale token doesn't discard the current one
+        provider.invalidate("old_token")
+        self.assertEqual("token1", provider.get_token())
+        provider.invalidate("token1")
+        self.assertEqual("token2", provider.get_token())
+
+    def test_proactive_refresh(self):
+        # Tokens within the refresh margin are returned while a new one is
+        # fetched in the background
+        provider = CountingAuthProvider(expires_in=10, refresh_margin=20)
+        self.assertEqual("token1", provider.get_token())
+        self.assertEqual("token1", provider.get_token())
+        time.sleep(0.2)
+        self.assertEqual("token2", provider._token)
+
+    def test_slow_refresh(self):
+        # A slow background renewal doesn't block callers while the current
+        # token is still valid
+        provider = CountingAuthProvider(expires_in=10, refresh_margin=20)
+        provider.get_token()
+        provider.delay = 1
+        start = time.monotonic()
+        with ThreadPoolExecutor(4) as pool:
+            tokens = list(pool.map(lambda _: provider.get_token(), range(4)))
+        self.assertEqual(["token1"] * 4, tokens)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+
+class TestAsyncAuthProvider(IsolatedAsyncioTestCase):
+
+    async def test_single_flight(self):
+        provider = AsyncCountingAuthProvider()
+        tokens = await asyncio.gather(*[provider.get_token() for _ in range(8)])
+        self.assertEqual(["token1"] * 8, tokens)
+        self.assertEqual(1, provider.calls)
+
+    async def test_proactive_refresh(self):
+        provider = AsyncCountingAuthProvider(expires_in=10, refresh_margin=20)
+        self.assertEqual("token1", await provider.get_token())
+        self.assertEqual("token1", await provider.get_token())
+        await asyncio.sleep(0.2)
+        self.assertEqual("token2", await provider.get_token())
+        provider.invalidate("token2")
+        self.assertEqual("token3", await provider.get_token())
+
+    async def test_failed_refresh(self):
+        # A failed background renewal keeps the current token and its
+        # exception is retrieved
+        errors = []
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda loop, context: errors.append(context))
+        provider = AsyncCountingAuthProvider(expires_in=10, refresh_margin=20)
+        self.assertEqual("token1", await provider.get_token())
+        provider.fail = True
+        self.assertEqual("token1", await provider.get_token())
+        await asyncio.sleep(0.05)
+        self.assertEqual("token1", await provider.get_token())
+        provider._refresh_task = None
+        gc.collect()
+        self.assertEqual([], errors)
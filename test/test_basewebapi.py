@@ -1,6 +1,17 @@
 from unittest import TestCase, mock
-from basewebapi import BaseWebAPI
+from basewebapi import BaseWebAPI, JSONBaseObject
+from basewebapi.auth import AuthProvider
+from basewebapi.cassette import Cassette
+from basewebapi.deadline import Deadline
+from basewebapi.delta import DeltaSync
+from basewebapi.response_store import ResponseStore
+from basewebapi.streaming import ResponseTooLargeError, SpilledBody
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
 import requests
+import tempfile
+import threading
+import time
 
 
 # Using Mock to replace requests.request so that we don't go hammering servers
@@ -16,6 +27,35 @@ def mocked_requests_request(*args, **kwargs):
     return ret_obj
 
 
+def mocked_auth_request(*args, **kwargs):
+    ret_obj = mock.Mock(spec=requests.Response)
+    if kwargs["headers"].get("Authorization") == "Bearer token2":
+        ret_obj.status_code = 200
+    else:
+        ret_obj.status_code = 401
+    return ret_obj
+
+
+def mocked_json_request(*args, **kwargs):
+    ret_obj = mock.Mock(spec=requests.Response)
+    ret_obj.status_code = 200
+    ret_obj.headers = {"Content-Type": "application/json; charset=utf-8"}
+    ret_obj.content = b'{"name": "Foo"}'
+    ret_obj.raw = None
+    return ret_obj
+
+
+class ExpiringAuthProvider(AuthProvider):
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def fetch_token(self):
+        self.calls += 1
+        return f"token{self.calls}", 3600
+
+
 class TestBaseWebAPI(TestCase):
     def setUp(self):
         self.good_obj = BaseWebAPI("localhost", "nouser", "nopass")
@@ -130,3 +170,266 @@ class TestBaseWebAPI(TestCase):
         self.assertRaises(
             requests.exceptions.HTTPError, self.bad_status_obj._transaction, "post", "/"
         )
+
+    @mock.patch("requests.request", side_effect=mocked_requests_request)
+    def test_upload(self, mock_req):
+        # Check the upload body is sent as a generator so requests uses
+        # chunked transfer encoding
+        progress = []
+        chunks = [b"foo", b"bar", b"baz"]
+        self.good_obj._upload(
+            "get", "/", chunks, progress=lambda s, t: progress.append(s)
+        )
+        body = mock_req.call_args.kwargs["data"]
+        self.assertFalse(isinstance(body, (bytes, list)))
+        self.assertEqual(b"foobarbaz", b"".join(body))
+        self.assertEqual([3, 6, 9], progress)
+
+    @mock.patch("requests.request", side_effect=mocked_requests_request)
+    def test_deadline(self, mock_req):
+        # Check the remaining time on the deadline is given to requests as
+        # the timeout, and expired deadlines never make a request
+        self.good_obj._transaction("get", "/", deadline=10, stream=True)
+        self.assertLessEqual(mock_req.call_args.kwargs["timeout"], 10)
+        self.assertGreater(mock_req.call_args.kwargs["timeout"], 9)
+        mock_req.reset_mock()
+        self.assertRaises(
+            requests.exceptions.Timeout,
+            self.good_obj._transaction,
+            "get",
+            "/",
+            deadline=Deadline(0),
+        )
+        mock_req.assert_not_called()
+
+    @mock.patch("requests.request", side_effect=mocked_auth_request)
+    def test_auth_provider(self, mock_req):
+        # Check a rejected token is refreshed and the request retried once
+        self.good_obj.headers = {"Accept": "application/json"}
+        self.good_obj.auth_provider = ExpiringAuthProvider()
+        result = self.good_obj._transaction("get", "/")
+        self.assertEqual(200, result.status_code)
+        self.assertEqual(2, mock_req.call_count)
+        self.assertEqual(
+            {"Accept": "application/json", "Authorization": "Bearer token2"},
+            mock_req.call_args.kwargs["headers"],
+        )
+        self.good_obj.auth_provider.invalidate()
+        self.assertRaises(
+            requests.exceptions.HTTPError, self.good_obj._transaction, "get", "/"
+        )
+        self.assertEqual(4, mock_req.call_count)
+
+    @mock.patch("requests.request", side_effect=mocked_json_request)
+    def test_stored_transaction(self, mock_req):
+        # Check stored responses are used instead of calling the API, and
+        # expired responses are revalidated in the background
+        self.assertRaises(ValueError, self.good_obj._stored_transaction, "get", "/")
+        self.good_obj.response_store = ResponseStore(":memory:")
+        result = self.good_obj._stored_transaction("get", "/", JSONBaseObject)
+        self.assertIsInstance(result, JSONBaseObject)
+        self.assertEqual({"name": "Foo"}, self.good_obj._stored_transaction("get", "/"))
+        self.assertEqual(1, mock_req.call_count)
+        self.good_obj._stored_transaction("get", "/other", max_age=-1)
+        self.good_obj._stored_transaction("get", "/other")
+        time.sleep(0.1)
+        self.assertEqual(3, mock_req.call_count)
+
+    def test_cassette(self):
+        # Record a transaction with requests mocked, then replay it with the
+        # network unavailable
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cassette.gz")
+            with mock.patch("requests.request", side_effect=mocked_json_request):
+                with Cassette(path, "record") as cassette:
+                    self.good_obj.cassette = cassette
+                    self.good_obj._transaction("get", "/", params={"id": 1})
+            with mock.patch("requests.request", side_effect=requests.ConnectionError):
+                self.good_obj.cassette = Cassette(path)
+                result = self.good_obj._transaction("get", "/", params={"id": 1})
+                self.assertEqual({"name": "Foo"}, result.json())
+                self.assertEqual(
+                    "application/json; charset=utf-8", result.headers["content-type"]
+                )
+                self.assertRaises(KeyError, self.good_obj._transaction, "get", "/")
+
+
+big_body = b"x" * 200000
+
+
+class LocalHandler(BaseHTTPRequestHandler):
+    # Keep-alive handler that records the client port of each request
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.server.peers.append(self.client_address[1])
+        if self.path == "/slow":
+            time.sleep(0.2)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/":
+            self.do_HEAD()
+            return
+        if self.path == "/collection":
+            self.collection()
+            return
+        if self.path == "/cookies":
+            self.send_response(200)
+            self.send_header("Set-Cookie", "first=1")
+            self.send_header("Set-Cookie", "second=2")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        # Large bodies, sent without a valid Content-Length for /chunked
+        # and /badlength
+        self.send_response(500 if self.path == "/error" else 200)
+        if self.path in ("/chunked", "/badlength"):
+            self.send_header("Connection", "close")
+            if self.path == "/badlength":
+                self.send_header("Content-Length", "lots")
+        else:
+            self.send_header("Content-Length", str(len(big_body)))
+        self.end_headers()
+        self.wfile.write(big_body)
+
+    def collection(self):
+        # A collection that only changes for conditional requests
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            return
+        body = b'{"results": [{"id": 1, "name": "Foo"}]}'
+        self.send_response(200)
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServer(ThreadingHTTPServer):
+    # Room for every warm up connection to wait to be accepted
+    request_queue_size = 32
+
+
+class TestBaseWebAPILocal(TestCase):
+
+    def setUp(self):
+        self.server = LocalServer(("127.0.0.1", 0), LocalHandler)
+        self.server.daemon_threads = True
+        self.server.peers = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.obj = BaseWebAPI(
+            "127.0.0.1", "nouser", "nopass", alt_port=str(self.server.server_port)
+        )
+
+    def tearDown(self):
+        self.obj.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_warm_up(self):
+        # Check transactions use the connections opened by warm_up
+        self.assertEqual(3, self.obj.warm_up(3))
+        self.assertEqual(3, len(set(self.server.peers)))
+        for _ in range(3):
+            self.obj._transaction("get", "/")
+        self.obj._transaction("get", "/", deadline=5)
+        self.assertEqual(3, len(set(self.server.peers)))
+        self.obj.close()
+        self.assertIsNone(self.obj.session)
+
+    def test_warm_up_parallel(self):
+        # Check the probes are sent in parallel, and a larger warm up grows
+        # the pool so it keeps every connection
+        self.obj.warmup_path = "/slow"
+        self.obj.warm_up(3)
+        self.server.peers.clear()
+        start = time.monotonic()
+        self.assertEqual(15, self.obj.warm_up(15))
+        self.assertLess(time.monotonic() - start, 1)
+        peers = set(self.server.peers)
+        self.assertEqual(15, len(peers))
+        self.server.peers.clear()
+        self.obj.warm_up(15)
+        self.assertEqual(peers, set(self.server.peers))
+
+    def test_keep_alive(self):
+        self.obj.keepalive_interval = 0.05
+        self.obj.warm_up()
+        time.sleep(0.3)
+        self.obj.close()
+        probes = len(self.server.peers)
+        self.assertGreater(probes, 2)
+        time.sleep(0.15)
+        self.assertEqual(probes, len(self.server.peers))
+
+    def test_max_body_size(self):
+        # Check bodies over the limit are rejected, from the Content-Length
+        # or while streaming
+        self.obj.max_body_size = 1000
+        for path in ("/big", "/chunked", "/badlength"):
+            self.assertRaises(ResponseTooLargeError, self.obj._transaction, "get", path)
+        result = self.obj._transaction("get", "/big", max_body_size=len(big_body))
+        self.assertEqual(big_body, result.content)
+
+    def test_error_body(self):
+        # Check error bodies are cut off at max_error_body
+        self.obj.max_error_body = 100
+        with self.assertRaises(requests.HTTPError) as context:
+            self.obj._transaction("get", "/error")
+        self.assertEqual(b"x" * 100, context.exception.response.content)
+
+    def test_spill(self):
+        # Check large bodies are held in a temporary file until used
+        self.obj.spill_threshold = 1000
+        result = self.obj._transaction("get", "/chunked")
+        self.assertIsInstance(result.raw, SpilledBody)
+        self.assertEqual(len(big_body), result.raw.size)
+        with result.raw.mmap() as mapped:
+            self.assertEqual(big_body, mapped[:])
+        self.assertEqual(big_body, b"".join(result.iter_content(65536)))
+        result.close()
+
+    def test_delta_transaction(self):
+        # Check the validators are sent and a 304 applies nothing
+        sync = DeltaSync()
+        delta = self.obj._delta_transaction(sync, "/collection", "results")
+        self.assertEqual([{"id": 1, "name": "Foo"}], delta.added)
+        self.assertEqual('"v1"', sync.etag)
+        self.assertIsNone(self.obj._delta_transaction(sync, "/collection", "results"))
+        self.assertEqual(1, len(sync))
+
+    def test_spill_recording(self):
+        # Check recorded bodies are kept in memory
+        self.obj.spill_threshold = 1000
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with Cassette(os.path.join(tmp_dir, "cassette.gz"), "record") as cassette:
+                self.obj.cassette = cassette
+                result = self.obj._transaction("get", "/big")
+            self.assertNotIsInstance(result.raw, SpilledBody)
+            self.assertEqual(big_body, result.content)
+
+    def test_cassette_headers(self):
+        # Check repeated headers are replayed and streamed responses are left
+        # for the caller to read rather than recorded
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cassette.gz")
+            with Cassette(path, "record") as cassette:
+                self.obj.cassette = cassette
+                live = self.obj._transaction("get", "/cookies")
+                result = self.obj._transaction("get", "/big", stream=True)
+                self.assertFalse(result._content_consumed)
+                self.assertEqual(big_body, b"".join(result.iter_content(65536)))
+                self.assertEqual(1, len(cassette))
+            self.obj.cassette = Cassette(path)
+            result = self.obj._transaction("get", "/cookies")
+            self.assertEqual("first=1, second=2", live.headers["Set-Cookie"])
+            self.assertEqual(live.headers["Set-Cookie"], result.headers["Set-Cookie"])
@@ -0,0 +1,60 @@
+from unittest import TestCase
+from basewebapi.cassette import Cassette
+import os
+import tempfile
+
+
+class TestCassette(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cassette.gz")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_bad_arguments(self):
+        self.assertRaises(ValueError, Cassette, self.path, "rewind")
+        self.assertRaises(ValueError, Cassette, self.path, "record", "slow")
+        self.assertRaises(FileNotFoundError, Cassette, self.path)
+
+    def test_record_replay(self):
+        with Cassette(self.path, "record") as cassette:
+            self.assertTrue(cassette.recording)
+            cassette.record(
+                "get", "http://localhost/", {"page": 1}, 200, {}, b"first", 0.5
+            )
+            cassette.record(
+                "get", "http://localhost/", {"page": 1}, 200, {}, b"second", 0.5
+            )
+            cassette.record("get", "http://localhost/bin", None, 200, {}, b"\xff", 0.1)
+        cassette = Cassette(self.path, latency="recorded")
+        self.assertEqual(3, len(cassette))
+        # Repeated requests are replayed in order, then start again
+        bodies = [
+            cassette.find("GET", "http://localhost/", {"page": 1}).body
+            for _ in range(3)
+        ]
+        self.assertEqual([b"first", b"second", b"first"], bodies)
+        interaction = cassette.find("get", "http://localhost/bin", None)
+        self.assertEqual(b"\xff", interaction.body)
+        self.assertEqual(0.1, cassette.delay(interaction))
+        self.assertRaises(KeyError, cassette.find, "post", "http://localhost/", None)
+        self.assertEqual(0.25, Cassette(self.path, latency=0.25).delay(interaction))
+        self.assertEqual(0.0, Cassette(self.path).delay(interaction))
+
+    def test_headers(self):
+        # Repeated headers are kept
+        headers = [("Set-Cookie", "first=1"), ("Set-Cookie", "second=2")]
+        with Cassette(self.path, "record") as cassette:
+            cassette.record("get", "http://localhost/", None, 200, headers, b"", 0.1)
+            cassette.record(
+                "get", "http://localhost/a", None, 200, {"ETag": '"v1"'}, b"", 0.1
+            )
+        cassette = Cassette(self.path)
+        self.assertEqual(
+            headers, cassette.find("get", "http://localhost/", None).headers
+        )
+        self.assertEqual(
+            [("ETag", '"v1"')], cassette.find("get", "http://localhost/a", None).headers
+        )
@@ -0,0 +1,24 @@
+from unittest import TestCase
+from basewebapi.deadline import Deadline
+import time
+
+
+class TestDeadline(TestCase):
+
+    def test_remaining(self):
+        deadline = Deadline(10)
+        self.assertFalse(deadline.expired)
+        self.assertGreater(deadline.remaining(), 9)
+        self.assertLessEqual(deadline.remaining(), 10)
+        expired = Deadline(0)
+        time.sleep(0.01)
+        self.assertTrue(expired.expired)
+        self.assertEqual(0.0, expired.remaining())
+        self.assertRaises(ValueError, Deadline, "10")
+
+    def test_resolve(self):
+        deadline = Deadline(5)
+        self.assertIs(deadline, Deadline.resolve(deadline, 1))
+        self.assertIsNone(Deadline.resolve(None))
+        self.assertGreater(Deadline.resolve(None, 3).remaining(), 2)
+        self.assertGreater(Deadline.resolve(4, 1).remaining(), 3)
@@ -0,0 +1,62 @@
+from unittest import TestCase
+from basewebapi import JSONBaseList, JSONBaseObject
+from basewebapi.delta import DeltaSync
+
+first_poll = [
+    {"id": 1, "name": "Foo", "updated": "2024-01-01"},
+    {"id": 2, "name": "Bar", "updated": "2024-01-01"},
+    {"id": 3, "name": "Baz", "updated": "2024-01-01"},
+]
+second_poll = [
+    {"updated": "2024-01-01", "name": "Foo", "id": 1},
+    {"id": 2, "name": "Barry", "updated": "2024-01-02"},
+    {"id": 4, "name": "Qux", "updated": "2024-01-03"},
+]
+
+
+class TestDeltaSync(TestCase):
+
+    def setUp(self):
+        self.sync = DeltaSync(updated_field="updated", deleted_field="deleted")
+        self.first_delta = self.sync.apply(first_poll)
+
+    def test_full_sync(self):
+        self.assertEqual(3, len(self.first_delta.added))
+        self.assertIsInstance(self.first_delta.added, JSONBaseList)
+        self.assertIsInstance(self.first_delta.added[0], JSONBaseObject)
+        delta = self.sync.apply(second_poll)
+        self.assertEqual(["Qux"], [x["name"] for x in delta.added])
+        self.assertEqual(["Barry"], [x["name"] for x in delta.changed])
+        self.assertEqual(["Baz"], [x["name"] for x in delta.removed])
+        self.assertEqual({1, 2, 4}, set(self.sync.snapshot))
+        self.assertEqual(3, len(self.sync.items))
+        self.assertFalse(self.sync.apply(second_poll))
+        self.assertRaises(KeyError, self.sync.apply, [{"name": "No ID"}])
+
+    def test_partial_sync(self):
+        self.assertEqual({"since": "2024-01-01"}, self.sync.cursor_params("since"))
+        delta = self.sync.apply(
+            [
+                {"id": 2, "name": "Barry", "updated": "2024-01-02"},
+                {"id": 3, "deleted": True, "updated": "2024-01-02"},
+            ],
+            partial=True,
+        )
+        self.assertEqual(1, len(delta.changed))
+        self.assertEqual(["Baz"], [x["name"] for x in delta.removed])
+        self.assertEqual({1, 2}, set(self.sync.snapshot))
+        self.assertEqual("2024-01-02", self.sync.cursor)
+
+    def test_conditional_headers(self):
+        self.assertEqual({}, DeltaSync().conditional_headers())
+        self.assertEqual({}, DeltaSync().cursor_params("since"))
+        self.sync.update_validators(
+            {"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        )
+        self.assertEqual(
+            {
+                "If-None-Match": '"abc"',
+                "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+            },
+            self.sync.conditional_headers(),
+        )
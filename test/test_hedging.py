@@ -0,0 +1,34 @@
+from unittest import TestCase
+from basewebapi.asyncbasewebapi import HedgePolicy
+
+
+class TestHedgePolicy(TestCase):
+
+    def test_incorrect_arguments(self):
+        self.assertRaises(ValueError, HedgePolicy, percentile=100)
+        self.assertRaises(ValueError, HedgePolicy, budget=1.5)
+        self.assertRaises(ValueError, HedgePolicy, window=0)
+
+    def test_delay(self):
+        policy = HedgePolicy(percentile=90, min_samples=10, min_delay=0.005)
+        for latency in range(9):
+            policy.record(latency / 100)
+        self.assertIsNone(policy.delay())
+        policy.record(0.09)
+        self.assertEqual(0.09, policy.delay())
+        for _ in range(100):
+            policy.record(0.001)
+        # Only the most recent latencies count, and never below min_delay
+        self.assertEqual(0.005, policy.delay())
+
+    def test_budget(self):
+        policy = HedgePolicy(budget=0.25)
+        allowed = 0
+        for _ in range(100):
+            policy.start()
+            allowed += policy.allow_hedge()
+        self.assertEqual(25, allowed)
+        self.assertEqual(0.25, policy.hedge_rate)
+        policy.record(0.1, hedge_won=True)
+        self.assertEqual(1, policy.hedge_wins)
+        self.assertEqual(0.04, policy.win_rate)
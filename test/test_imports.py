@@ -0,0 +1,49 @@
+from unittest import TestCase
+import subprocess
+import sys
+
+
+def imported_modules(statement: str) -> str:
+    # Run the import in a fresh interpreter so earlier tests don't affect it
+    script = f"import sys\n{statement}\nprint(' '.join(sys.modules))"
+    return subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, check=True, text=True
+    ).stdout.split()
+
+
+class TestLazyImports(TestCase):
+
+    def test_json_objects(self):
+        modules = imported_modules("from basewebapi import JSONBaseObject")
+        self.assertNotIn("requests", modules)
+        self.assertNotIn("aiohttp", modules)
+
+    def test_serialise(self):
+        modules = imported_modules("import basewebapi.serialise")
+        self.assertNotIn("requests", modules)
+        self.assertNotIn("aiohttp", modules)
+
+    def test_async_helpers(self):
+        modules = imported_modules(
+            "from basewebapi.asyncbasewebapi import AdaptiveLimiter"
+        )
+        self.assertNotIn("aiohttp", modules)
+
+    def test_basewebapi(self):
+        modules = imported_modules("from basewebapi import BaseWebAPI")
+        self.assertIn("requests", modules)
+        self.assertNotIn("aiohttp", modules)
+        # The optional helpers are only imported when they are used
+        self.assertNotIn("asyncio", modules)
+        self.assertNotIn("sqlite3", modules)
+        self.assertNotIn("gzip", modules)
+
+    def test_asyncbasewebapi(self):
+        modules = imported_modules(
+            "from basewebapi.asyncbasewebapi import AsyncBaseWebAPI"
+        )
+        self.assertIn("aiohttp", modules)
+        self.assertNotIn("requests", modules)
+        import basewebapi
+
+        self.assertRaises(AttributeError, getattr, basewebapi, "NotAClass")
@@ -1,5 +1,6 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 from basewebapi import JSONBaseList, JSONBaseObject
+from concurrent.futures import ThreadPoolExecutor
 
 good_json_object = {"name": "Foo", "id": 1}
 bad_json_object = "string"
@@ -22,6 +23,16 @@ bad_text_filter_list = [
 ]
 
 
+created = []
+
+
+class CountedObject(JSONBaseObject):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        created.append(self)
+
+
 class TestJSONBaseObject(TestCase):
 
     def setUp(self):
@@ -78,3 +89,42 @@ class TestJSONBaseList(TestCase):
         text_filter_test = self.bad_text_list.filter("name", "ba", fuzzy=True)
         self.assertIsInstance(text_filter_test, JSONBaseList)
         self.assertEqual(1, len(text_filter_test))
+
+    def test_from_json_generator(self):
+        generator_list = JSONBaseList.from_json(x for x in good_json_list)
+        self.assertIsInstance(generator_list, JSONBaseList)
+        self.assertEqual(self.good_list, generator_list)
+        self.assertRaises(ValueError, JSONBaseList.from_json, "string")
+
+    def test_from_json_parallel(self):
+        self.assertRaises(ValueError, JSONBaseList.from_json_parallel, bad_json_list)
+        big_list = [{"name": f"Foo{i}", "id": i} for i in range(10)]
+        parallel_list = JSONBaseList.from_json_parallel(
+            big_list, JSONBaseObject, workers=2, chunk_size=3
+        )
+        self.assertIsInstance(parallel_list, JSONBaseList)
+        self.assertEqual(big_list, parallel_list)
+        for json_object in parallel_list:
+            self.assertIsInstance(json_object, JSONBaseObject)
+        small_list = JSONBaseList.from_json_parallel(good_json_list)
+        self.assertEqual(self.good_list, small_list)
+
+    def test_from_json_parallel_window(self):
+        # Check a generator is only read a few chunks ahead of the objects
+        # being created, using threads so the objects can be counted
+        ahead = []
+
+        def generate():
+            for i in range(100):
+                ahead.append(i - len(created))
+                yield {"id": i}
+
+        created.clear()
+        with mock.patch("concurrent.futures.ProcessPoolExecutor", ThreadPoolExecutor):
+            result = JSONBaseList.from_json_parallel(
+                generate(), CountedObject, workers=1, chunk_size=5
+            )
+        self.assertEqual(100, len(result))
+        self.assertEqual(list(range(100)), [item["id"] for item in result])
+        # Two chunks in flight and the one being read
+        self.assertLessEqual(max(ahead), 15)
@@ -0,0 +1,76 @@
+from unittest import IsolatedAsyncioTestCase
+from basewebapi.asyncbasewebapi import AdaptiveLimiter
+import asyncio
+
+
+class TestAdaptiveLimiter(IsolatedAsyncioTestCase):
+
+    def test_incorrect_arguments(self):
+        self.assertRaises(ValueError, AdaptiveLimiter, 0)
+        self.assertRaises(ValueError, AdaptiveLimiter, 10, max_limit=5)
+        self.assertRaises(ValueError, AdaptiveLimiter, backoff=1.5)
+        self.assertRaises(ValueError, AdaptiveLimiter, baseline_window=0)
+
+    async def test_additive_increase(self):
+        limiter = AdaptiveLimiter(initial_limit=2)
+        for _ in range(10):
+            start = await limiter.acquire()
+            limiter.release(start)
+        self.assertGreater(limiter.limit, 2)
+        self.assertEqual(0, limiter.in_flight)
+
+    async def test_multiplicative_decrease(self):
+        limiter = AdaptiveLimiter(initial_limit=8)
+        starts = [await limiter.acquire() for _ in range(4)]
+        # Only the first overload for transactions in the same window backs
+        # off
+        for start in starts:
+            limiter.release(start, overloaded=True)
+        self.assertEqual(4, limiter.limit)
+        start = await limiter.acquire()
+        limiter.release(start, overloaded=True)
+        self.assertEqual(2, limiter.limit)
+
+    async def test_latency_gradient(self):
+        limiter = AdaptiveLimiter(
+            initial_limit=8, latency_tolerance=2.0, baseline_window=2
+        )
+        for _ in range(2):
+            start = await limiter.acquire()
+            limiter.release(start - 0.01)
+        self.assertEqual(8, limiter.limit)
+        start = await limiter.acquire()
+        limiter.release(start - 1.0)
+        self.assertEqual(4, limiter.limit)
+
+    async def test_discard(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.discard()
+        await waiter
+        self.assertEqual(1, limiter.limit)
+        self.assertEqual(1, limiter.in_flight)
+
+    async def test_mixed_endpoints(self):
+        # Steady latencies from fast and slow endpoints aren't overload
+        limiter = AdaptiveLimiter(initial_limit=8)
+        for latency in [0.001] + [0.005] * 50 + [0.001, 0.005] * 50:
+            start = await limiter.acquire()
+            limiter.release(start - latency)
+        self.assertGreater(limiter.limit, 8)
+        self.assertGreater(limiter.baseline_latency, 0.001)
+
+    async def test_waiting(self):
+        limiter = AdaptiveLimiter(initial_limit=1)
+        start = await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        cancelled = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        limiter.release(start)
+        await waiter
+        self.assertEqual(1, limiter.in_flight)
@@ -0,0 +1,66 @@
+from unittest import TestCase
+from basewebapi import JSONBaseList
+from basewebapi.response_store import ResponseStore
+import os
+import tempfile
+
+
+class TestResponseStore(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "store.db")
+        self.store = ResponseStore(self.path, max_age=60)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_make_key(self):
+        key = ResponseStore.make_key("get", "http://localhost/", {"a": 1, "b": 2})
+        self.assertEqual(
+            key, ResponseStore.make_key("GET", "http://localhost/", {"b": 2, "a": 1})
+        )
+        self.assertNotEqual(key, ResponseStore.make_key("get", "http://localhost/"))
+        # Per-call headers and bodies change the response
+        key = ResponseStore.make_key("get", "http://localhost/")
+        self.assertEqual(
+            ResponseStore.make_key("get", "http://localhost/", None, {"Accept": "a"}),
+            ResponseStore.make_key("get", "http://localhost/", None, {"accept": "a"}),
+        )
+        self.assertNotEqual(
+            key,
+            ResponseStore.make_key("get", "http://localhost/", None, {"Accept": "a"}),
+        )
+        self.assertNotEqual(
+            ResponseStore.make_key("post", "http://localhost/", body={"a": 1}),
+            ResponseStore.make_key("post", "http://localhost/", body={"a": 2}),
+        )
+        self.assertNotEqual(
+            ResponseStore.make_key("post", "http://localhost/", body=b"a"),
+            ResponseStore.make_key("post", "http://localhost/", body=b"b"),
+        )
+        self.assertRaises(
+            ValueError, ResponseStore.make_key, "post", "/", body=iter([b"a"])
+        )
+
+    def test_put_get(self):
+        self.assertIsNone(self.store.get("missing"))
+        self.store.put("list", b'[{"name": "Foo"}]', "application/json")
+        self.store.put("text", b"hello", "text/plain", max_age=-1)
+        stored = self.store.get("list")
+        self.assertTrue(stored.fresh)
+        result = stored.decode(JSONBaseList)
+        self.assertIsInstance(result, JSONBaseList)
+        self.assertEqual("Foo", result[0]["name"])
+        self.assertFalse(self.store.get("text").fresh)
+        self.assertEqual("hello", self.store.get("text").decode())
+        self.store.delete("text")
+        self.assertIsNone(self.store.get("text"))
+
+    def test_persistence(self):
+        self.store.put("list", b"[1, 2, 3]", "application/json")
+        self.store.close()
+        with ResponseStore(self.path) as store:
+            self.assertEqual([1, 2, 3], store.get("list").decode())
+        self.store = ResponseStore(self.path)
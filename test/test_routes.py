@@ -0,0 +1,28 @@
+from unittest import TestCase
+from basewebapi import BaseWebAPI
+from basewebapi.routes import EncodedURL, Route, route
+
+
+class TestRoute(TestCase):
+
+    def test_build(self):
+        pokemon = Route("/api/v2/pokemon/{name}/")
+        self.assertEqual(("name",), pokemon.fields)
+        path = pokemon.build(name="mr mime")
+        self.assertIsInstance(path, EncodedURL)
+        self.assertEqual("/api/v2/pokemon/mr%20mime/", path)
+        self.assertEqual("/api/v2/pokemon/a%2Fb/", pokemon(name="a/b"))
+        self.assertRaises(KeyError, pokemon.build)
+        padded = Route("/items/{id:05d}/{page}")
+        self.assertEqual("/items/00042/3", padded.build(id=42, page=3))
+        self.assertEqual("/static/caf%C3%A9/", Route("/static/café/").build())
+
+    def test_incorrect_templates(self):
+        self.assertRaises(ValueError, Route, 123)
+        self.assertRaises(ValueError, Route, "/items/{}/")
+        self.assertRaises(ValueError, Route, "/items/{0}/")
+        self.assertRaises(ValueError, Route, "/items/{id!r}/")
+
+    def test_route_cache(self):
+        self.assertIs(route("/a/{b}/"), route("/a/{b}/"))
+        self.assertIs(route("/a/{b}/"), BaseWebAPI.route("/a/{b}/"))
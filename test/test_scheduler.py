@@ -0,0 +1,82 @@
+from unittest import IsolatedAsyncioTestCase
+from basewebapi.asyncbasewebapi import (
+    PRIORITY_BULK,
+    PRIORITY_HIGH,
+    PriorityScheduler,
+    SchedulerFullError,
+)
+import asyncio
+
+
+class TestPriorityScheduler(IsolatedAsyncioTestCase):
+
+    async def run_queued(self, scheduler, requests):
+        # Fill the scheduler, queue the requests, then release the slot and
+        # record the order the queued requests start in
+        order = []
+
+        async def request(name, priority, tenant):
+            await scheduler.acquire(priority, tenant)
+            order.append(name)
+            await asyncio.sleep(0)
+            scheduler.release()
+
+        await scheduler.acquire()
+        tasks = [asyncio.ensure_future(request(*x)) for x in requests]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    def test_incorrect_arguments(self):
+        self.assertRaises(ValueError, PriorityScheduler, 0)
+        self.assertRaises(ValueError, PriorityScheduler, 1, -1)
+
+    async def test_priority(self):
+        scheduler = PriorityScheduler(max_concurrency=1)
+        order = await self.run_queued(
+            scheduler,
+            [
+                ("bulk1", PRIORITY_BULK, None),
+                ("bulk2", PRIORITY_BULK, None),
+                ("high", PRIORITY_HIGH, None),
+            ],
+        )
+        self.assertEqual(["high", "bulk1", "bulk2"], order)
+        self.assertEqual(0, scheduler.in_flight)
+        self.assertEqual(0, scheduler.queue_depth)
+
+    async def test_weighted_fair_queuing(self):
+        scheduler = PriorityScheduler(max_concurrency=1, weights={"a": 2})
+        requests = [(f"a{i}", PRIORITY_BULK, "a") for i in range(4)]
+        requests += [(f"b{i}", PRIORITY_BULK, "b") for i in range(2)]
+        order = await self.run_queued(scheduler, requests)
+        self.assertEqual(["a0", "a1", "b0", "a2", "a3", "b1"], order)
+
+    async def test_shedding(self):
+        scheduler = PriorityScheduler(max_concurrency=1, max_queue_depth=1)
+        await scheduler.acquire()
+        bulk = asyncio.ensure_future(scheduler.acquire(PRIORITY_BULK))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(scheduler.acquire(PRIORITY_HIGH))
+        await asyncio.sleep(0)
+        with self.assertRaises(SchedulerFullError):
+            await bulk
+        with self.assertRaises(SchedulerFullError):
+            await scheduler.acquire(PRIORITY_BULK)
+        self.assertEqual(2, scheduler.shed_count)
+        scheduler.release()
+        await high
+        self.assertEqual(1, scheduler.in_flight)
+        self.assertEqual(0, scheduler.queue_depth)
+
+    async def test_cancelled(self):
+        scheduler = PriorityScheduler(max_concurrency=1)
+        await scheduler.acquire()
+        waiter = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        self.assertEqual(0, scheduler.queue_depth)
+        scheduler.release()
+        self.assertEqual(0, scheduler.in_flight)
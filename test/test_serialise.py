@@ -0,0 +1,136 @@
+from unittest import TestCase, mock
+from basewebapi import JSONBaseList, JSONBaseObject
+from basewebapi import serialise
+from basewebapi.serialise import LazyJSONList, dumps, loads
+
+
+class Ability(JSONBaseObject):
+    pass
+
+
+class Abilities(JSONBaseList):
+
+    @classmethod
+    def from_json(cls, data):
+        return super().from_json(data, Ability)
+
+
+class Pokemon(JSONBaseObject):
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            child_objects={"abilities": Abilities, "species": JSONBaseObject},
+            **kwargs,
+        )
+
+
+pokemon = [
+    {
+        "id": 25,
+        "name": "pikachu",
+        "abilities": [{"name": "static"}, {"name": "lightning-rod"}],
+        "species": {"name": "pikachu", "url": "/species/25/"},
+        "forms": [{"name": "pikachu"}],
+    },
+    {
+        "id": 132,
+        "name": "ditto",
+        "abilities": [],
+        "species": None,
+        "forms": [],
+        "moves": [1, 2, {"name": "transform"}],
+    },
+]
+
+
+class TestSerialise(TestCase):
+
+    def setUp(self):
+        self.pokemon = JSONBaseList.from_json(pokemon, Pokemon)
+
+    def test_round_trip(self):
+        for compress in (False, True):
+            result = JSONBaseList.from_bytes(self.pokemon.to_bytes(compress))
+            self.assertEqual(result, self.pokemon)
+            self.assertIs(type(result), JSONBaseList)
+            self.assertIs(type(result[0]), Pokemon)
+            self.assertIs(type(result[0]["abilities"]), Abilities)
+            self.assertIs(type(result[0]["abilities"][0]), Ability)
+            self.assertIs(type(result[0]["species"]), JSONBaseObject)
+            self.assertIs(type(result[0]["forms"][0]), dict)
+            self.assertIs(type(result[1]["abilities"]), list)
+            self.assertIs(type(result[1]["moves"][2]), dict)
+
+    def test_object(self):
+        result = Pokemon.from_bytes(self.pokemon[0].to_bytes())
+        self.assertEqual(result, self.pokemon[0])
+        self.assertIs(type(result["abilities"]), Abilities)
+        self.assertRaises(ValueError, Ability.from_bytes, result.to_bytes())
+        self.assertRaises(ValueError, JSONBaseList.from_bytes, result.to_bytes())
+
+    def test_plain(self):
+        self.assertEqual(loads(dumps(pokemon)), pokemon)
+        self.assertEqual(loads(dumps([])), [])
+        self.assertRaises(ValueError, dumps, "pikachu")
+        self.assertRaises(TypeError, dumps, {"when": object()})
+
+    def test_compress(self):
+        data = JSONBaseList.from_json(pokemon * 100, Pokemon)
+        self.assertLess(len(data.to_bytes(True)), len(data.to_bytes()) / 10)
+
+    def test_classes(self):
+        # Each object keeps its own class, wherever it is
+        mixed = JSONBaseList([Ability(name="static"), Pokemon(name="ditto")])
+        result = loads(dumps(mixed))
+        self.assertEqual([Ability, Pokemon], [type(item) for item in result])
+        result = loads(dumps({"species": JSONBaseObject(), "forms": ()}))
+        self.assertIs(type(result["species"]), JSONBaseObject)
+        self.assertEqual(result["forms"], [])
+
+    def test_json_fallback(self):
+        # Without msgpack the rows are stored as JSON, and large integers
+        # that msgpack can't store fall back to JSON too
+        with mock.patch.object(serialise, "msgpack", None):
+            data = self.pokemon.to_bytes()
+            self.assertFalse(data[4] & serialise.FLAG_MSGPACK)
+            self.assertEqual(JSONBaseList.from_bytes(data), self.pokemon)
+            self.assertEqual(LazyJSONList(data)[1], self.pokemon[1])
+            self.assertEqual(loads(dumps(pokemon)), pokemon)
+        if serialise.msgpack is None:
+            return
+        data = self.pokemon.to_bytes()
+        self.assertTrue(data[4] & serialise.FLAG_MSGPACK)
+        with mock.patch.object(serialise, "msgpack", None):
+            self.assertRaises(ValueError, loads, data)
+        big = {"id": 2**70, "moves": [2**70]}
+        self.assertFalse(dumps(big)[4] & serialise.FLAG_MSGPACK)
+        self.assertEqual(loads(dumps(big)), big)
+
+    def test_invalid(self):
+        class Local(JSONBaseObject):
+            pass
+
+        self.assertRaises(ValueError, dumps, Local(name="pikachu"))
+        self.assertRaises(ValueError, loads, b"not serialised")
+        # Only JSON classes are imported when loading
+        data = dumps(Ability(name="static"))
+        self.assertRaises(ValueError, loads, data.replace(b":Ability", b":pokemon"))
+        self.assertRaises(ValueError, loads, data.replace(b"test", b"this"))
+        # Lists can't be loaded as objects
+        data = dumps(JSONBaseList([Ability(name="static")]))
+        self.assertRaises(ValueError, loads, data.replace(b'"list":0', b'"list":1'))
+
+    def test_lazy(self):
+        data = self.pokemon.to_bytes()
+        lazy = LazyJSONList(memoryview(data))
+        self.assertEqual(len(lazy), 2)
+        self.assertEqual(lazy[1], self.pokemon[1])
+        self.assertIs(type(lazy[-2]), Pokemon)
+        self.assertIs(type(lazy[0]["abilities"][1]), Ability)
+        self.assertRaises(IndexError, lazy.__getitem__, 2)
+        self.assertEqual(list(lazy), self.pokemon)
+        self.assertIs(type(lazy[1:]), JSONBaseList)
+        self.assertEqual(lazy.materialise(), self.pokemon)
+        self.assertEqual(list(LazyJSONList(self.pokemon.to_bytes(True))), self.pokemon)
+        self.assertEqual(list(LazyJSONList(dumps([1, "two"]))), [1, "two"])
+        self.assertRaises(ValueError, LazyJSONList, dumps(self.pokemon[0]))
@@ -0,0 +1,109 @@
+from unittest import IsolatedAsyncioTestCase, TestCase
+from basewebapi.streaming import (
+    BodyBuffer,
+    ResponseTooLargeError,
+    SpilledBody,
+    astream_body,
+    file_chunks,
+    stream_body,
+)
+import os
+import tempfile
+
+payload = bytes(range(256)) * 1000
+
+
+class TestStreamBody(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.NamedTemporaryFile(delete=False)
+        tmp.write(payload)
+        tmp.close()
+        self.path = tmp.name
+        empty = tempfile.NamedTemporaryFile(delete=False)
+        empty.close()
+        self.empty_path = empty.name
+
+    def tearDown(self):
+        os.unlink(self.path)
+        os.unlink(self.empty_path)
+
+    def test_file_chunks(self):
+        chunks = list(file_chunks(self.path, chunk_size=1000))
+        self.assertEqual(256, len(chunks))
+        self.assertEqual(payload, b"".join(chunks))
+        self.assertEqual([], list(file_chunks(self.empty_path)))
+
+    def test_stream_body(self):
+        progress = []
+        chunks = stream_body(
+            self.path, chunk_size=4096, progress=lambda s, t: progress.append((s, t))
+        )
+        self.assertEqual(payload, b"".join(chunks))
+        self.assertEqual((len(payload), len(payload)), progress[-1])
+        self.assertEqual(payload, b"".join(stream_body(payload, chunk_size=100)))
+        progress.clear()
+        generator = (payload[i : i + 10] for i in range(0, 100, 10))
+        body = b"".join(
+            stream_body(generator, progress=lambda s, t: progress.append((s, t)))
+        )
+        self.assertEqual(payload[:100], body)
+        self.assertEqual((100, None), progress[-1])
+        # Bad sources fail straight away, not once the body is being sent
+        self.assertRaises(ValueError, stream_body, 123)
+        missing = self.path + ".missing"
+        self.assertRaises(FileNotFoundError, stream_body, missing)
+
+
+class TestAsyncStreamBody(IsolatedAsyncioTestCase):
+
+    async def test_astream_body(self):
+        async def agen():
+            for i in range(0, 100, 10):
+                yield payload[i : i + 10]
+
+        progress = []
+        chunks = [
+            c
+            async for c in astream_body(
+                agen(), progress=lambda s, t: progress.append((s, t))
+            )
+        ]
+        self.assertEqual(payload[:100], b"".join(chunks))
+        self.assertEqual((100, None), progress[-1])
+        chunks = [c async for c in astream_body(payload, chunk_size=1000)]
+        self.assertEqual(payload, b"".join(chunks))
+        self.assertRaises(ValueError, astream_body, 123)
+
+
+class TestBodyBuffer(TestCase):
+
+    def test_limit(self):
+        buffer = BodyBuffer(limit=10)
+        self.assertTrue(buffer.write(b"x" * 10))
+        self.assertRaises(ResponseTooLargeError, buffer.write, b"x")
+        self.assertRaises(ResponseTooLargeError, buffer.check_length, 11)
+        buffer.check_length(None)
+
+    def test_truncate(self):
+        buffer = BodyBuffer(limit=10, truncate=True)
+        buffer.check_length(100)
+        self.assertTrue(buffer.write(b"x" * 6))
+        self.assertFalse(buffer.write(b"y" * 6))
+        self.assertTrue(buffer.truncated)
+        self.assertEqual(b"xxxxxxyyyy", buffer.finish())
+
+    def test_spill(self):
+        buffer = BodyBuffer(spill_threshold=100)
+        buffer.write(b'{"data": "')
+        self.assertIsInstance(buffer.finish(), bytes)
+        buffer.write(b"x" * 100)
+        buffer.write(b'"}')
+        with buffer.finish("application/json") as body:
+            self.assertIsInstance(body, SpilledBody)
+            self.assertEqual(112, len(body))
+            self.assertEqual("application/json", body.content_type)
+            self.assertEqual({"data": "x" * 100}, body.json())
+            self.assertEqual(b'{"data": "xx', next(body.iter_chunks(12)))
+            with body.mmap() as mapped:
+                self.assertEqual(b'"}', mapped[-2:])